@@ -1,13 +1,182 @@
 import tempfile
 import sysconfig
+import os
+import re
 import os.path
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from distutils import ccompiler
 
 
 __all__ = ["build_cxx"]
 
 
+def _cache_dir():
+    # The cache can be moved with the NMIGEN_CXX_CACHE_DIR environment variable, or disabled
+    # by setting it to an empty string.
+    cache_dir = os.environ.get("NMIGEN_CXX_CACHE_DIR")
+    if cache_dir is None:
+        if os.name == "nt":
+            cache_root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        else:
+            cache_root = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        cache_dir = os.path.join(cache_root, "nmigen", "cxx")
+    return cache_dir or None
+
+
+def _cache_size_limit():
+    # In megabytes.
+    size_limit = os.environ.get("NMIGEN_CXX_CACHE_SIZE", "1024")
+    if not re.fullmatch(r"[0-9]+", size_limit.strip()):
+        raise ValueError("Environment variable NMIGEN_CXX_CACHE_SIZE must be a non-negative "
+                         "integer, not {!r}"
+                         .format(size_limit))
+    return int(size_limit) * 1024 * 1024
+
+
+def _compiler_config():
+    config = {}
+    for name in ("CC", "CXX", "CCSHARED", "LDSHARED", "LDCXXSHARED"):
+        config[name] = sysconfig.get_config_var(name)
+    return config
+
+
+def _include_state(include_dirs):
+    # Included headers are not tracked individually; instead, any change to the include
+    # directories invalidates every entry that depends on them.
+    state = []
+    for include_dir in include_dirs:
+        include_dir = os.path.abspath(include_dir)
+        state.append(include_dir)
+        for dirpath, dirnames, filenames in sorted(os.walk(include_dir)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                stat = os.stat(os.path.join(dirpath, filename))
+                state.append([os.path.relpath(os.path.join(dirpath, filename), include_dir),
+                              stat.st_size, stat.st_mtime_ns])
+    return state
+
+
+def _cache_key(*, cxx_sources, output_name, include_state, macros, config):
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps({
+        "sources":     sorted(cxx_sources.items()),
+        "output_name": output_name,
+        "includes":    include_state,
+        "macros":      list(macros),
+        "compiler":    config,
+    }, sort_keys=True).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def _cache_lookup(cache_dir, key, filename, build_dir):
+    entry = os.path.join(cache_dir, "{}-{}".format(key, os.path.basename(filename)))
+    try:
+        # Mark the entry as recently used, so that it is evicted last.
+        os.utime(entry)
+        shutil.copyfile(entry, os.path.join(build_dir.name, filename))
+        return True
+    except OSError:
+        # Either a miss, or the entry was evicted by another process in the meantime.
+        return False
+
+
+def _cache_store(cache_dir, key, filename, build_dir, size_limit):
+    entry = os.path.join(cache_dir, "{}-{}".format(key, os.path.basename(filename)))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Other processes may be building the same library concurrently; write the entry under
+        # a unique name and atomically move it in place, so that it is never seen incomplete.
+        fd, temp_entry = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+        try:
+            with open(fd, "wb") as temp_file, \
+                    open(os.path.join(build_dir.name, filename), "rb") as built_file:
+                shutil.copyfileobj(built_file, temp_file)
+            os.replace(temp_entry, entry)
+        finally:
+            if os.path.exists(temp_entry):
+                os.unlink(temp_entry)
+        _cache_evict(cache_dir, size_limit)
+    except OSError:
+        # The cache is only an optimization; an unwritable cache directory is not an error.
+        pass
+
+
+def _cache_evict(cache_dir, size_limit):
+    entries = []
+    for entry_name in os.listdir(cache_dir):
+        if entry_name.startswith("."):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, entry_name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry_name))
+
+    total_size = sum(size for mtime, size, entry_name in entries)
+    for mtime, size, entry_name in sorted(entries):
+        if total_size <= size_limit:
+            break
+        try:
+            os.unlink(os.path.join(cache_dir, entry_name))
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def _new_cc_driver(*, include_dirs, macros, config):
+    cc_driver = ccompiler.new_compiler()
+    cc_driver.output_dir = "."
+
+    cc = config["CC"]
+    cxx = config["CXX"]
+    cflags = config["CCSHARED"]
+    ld_flags = config["LDSHARED"]
+    ld_cxxflags = config["LDCXXSHARED"]
+    if ld_cxxflags is None:
+        # PyPy doesn't have LDCXXSHARED. Glue it together from CXX and LDSHARED and hope that
+        # the result actually works; not many good options here.
+        ld_cxxflags = " ".join([cxx.split()[0], *ld_flags.split()[1:]])
+    cc_driver.set_executables(
+        compiler=f"{cc} {cflags}",
+        compiler_so=f"{cc} {cflags}",
+        compiler_cxx=f"{cxx} {cflags}",
+        linker_so=ld_cxxflags,
+    )
+
+    for include_dir in include_dirs:
+        cc_driver.add_include_dir(include_dir)
+    for macro in macros:
+        cc_driver.define_macro(macro)
+    return cc_driver
+
+
 def build_cxx(*, cxx_sources, output_name, include_dirs, macros):
+    """Build a shared library from C++ sources.
+
+    Every source file is compiled in parallel. Compiled object files and libraries are cached
+    (in the directory specified by the ``NMIGEN_CXX_CACHE_DIR`` environment variable, by default
+    in the user cache directory, or not at all if it is empty), keyed by the sources, the include
+    directories and their contents, the macros, and the compiler configuration. The least
+    recently used files are evicted once the cache grows larger than ``NMIGEN_CXX_CACHE_SIZE``
+    megabytes (1024 by default).
+
+    Returns a tuple of a :class:`tempfile.TemporaryDirectory` and the name of the library within
+    that directory.
+    """
+    config = _compiler_config()
+    cache_dir = _cache_dir()
+    if cache_dir is not None:
+        # Check the size limit before building anything, so that a malformed value is reported
+        # instead of failing a build that has already succeeded.
+        size_limit = _cache_size_limit()
+        include_state = _include_state(include_dirs)
+        def cache_key(cxx_sources, output_name):
+            return _cache_key(cxx_sources=cxx_sources, output_name=output_name,
+                              include_state=include_state, macros=macros, config=config)
+
     build_dir = tempfile.TemporaryDirectory(prefix="nmigen_cxx_")
 
     cwd = os.getcwd()
@@ -17,39 +186,40 @@ def build_cxx(*, cxx_sources, output_name, include_dirs, macros):
         # the output directory directly.
         os.chdir(build_dir.name)
 
-        cc_driver = ccompiler.new_compiler()
-        cc_driver.output_dir = "."
-
-        cc = sysconfig.get_config_var("CC")
-        cxx = sysconfig.get_config_var("CXX")
-        cflags = sysconfig.get_config_var("CCSHARED")
-        ld_flags = sysconfig.get_config_var("LDSHARED")
-        ld_cxxflags = sysconfig.get_config_var("LDCXXSHARED")
-        if ld_cxxflags is None:
-            # PyPy doesn't have LDCXXSHARED. Glue it together from CXX and LDSHARED and hope that
-            # the result actually works; not many good options here.
-            ld_cxxflags = " ".join([cxx.split()[0], *ld_flags.split()[1:]])
-        cc_driver.set_executables(
-            compiler=f"{cc} {cflags}",
-            compiler_so=f"{cc} {cflags}",
-            compiler_cxx=f"{cxx} {cflags}",
-            linker_so=ld_cxxflags,
-        )
-
-        for include_dir in include_dirs:
-            cc_driver.add_include_dir(include_dir)
-        for macro in macros:
-            cc_driver.define_macro(macro)
+        cc_driver = _new_cc_driver(include_dirs=include_dirs, macros=macros, config=config)
+        so_filename = cc_driver.shared_object_filename(output_name)
+        if cache_dir is not None:
+            so_key = cache_key(cxx_sources, output_name)
+            if _cache_lookup(cache_dir, so_key, so_filename, build_dir):
+                return build_dir, so_filename
+
         for cxx_filename, cxx_source in cxx_sources.items():
             with open(cxx_filename, "w") as f:
                 f.write(cxx_source)
 
         cxx_filenames = list(cxx_sources.keys())
         obj_filenames = cc_driver.object_filenames(cxx_filenames)
-        so_filename = cc_driver.shared_object_filename(output_name)
 
-        cc_driver.compile(cxx_filenames)
+        def compile_one(cxx_filename, obj_filename):
+            if cache_dir is not None:
+                obj_key = cache_key({cxx_filename: cxx_sources[cxx_filename]}, obj_filename)
+                if _cache_lookup(cache_dir, obj_key, obj_filename, build_dir):
+                    return
+            # A compiler driver is not thread-safe, so each source file gets its own.
+            _new_cc_driver(include_dirs=include_dirs, macros=macros, config=config) \
+                .compile([cxx_filename])
+            if cache_dir is not None:
+                _cache_store(cache_dir, obj_key, obj_filename, build_dir, size_limit)
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = [executor.submit(compile_one, cxx_filename, obj_filename)
+                       for cxx_filename, obj_filename in zip(cxx_filenames, obj_filenames)]
+            for future in futures:
+                future.result()
+
         cc_driver.link_shared_object(obj_filenames, output_filename=so_filename, target_lang="c++")
+        if cache_dir is not None:
+            _cache_store(cache_dir, so_key, so_filename, build_dir, size_limit)
 
         return build_dir, so_filename
 
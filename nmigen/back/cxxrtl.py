@@ -5,7 +5,12 @@ from . import rtlil
 __all__ = ["YosysError", "convert", "convert_fragment"]
 
 
-def _convert_rtlil_text(rtlil_text, black_boxes, *, src_loc_at=0):
+def _convert_rtlil_text(rtlil_text, black_boxes, *, opt_level=None, flatten=True, src_loc_at=0):
+    if opt_level not in (None, 0, 1, 2, 3, 4, 5, 6, "g"):
+        raise ValueError("CXXRTL optimization level must be an integer between 0 and 6 or "
+                         "'g', not {!r}"
+                         .format(opt_level))
+
     if black_boxes is not None:
         if not isinstance(black_boxes, dict):
             raise TypeError("CXXRTL black boxes must be a dictionary, not {!r}"
@@ -26,16 +31,23 @@ def _convert_rtlil_text(rtlil_text, black_boxes, *, src_loc_at=0):
             script.append("read_ilang <<rtlil\n{}\nrtlil".format(box_source))
     script.append("read_ilang <<rtlil\n{}\nrtlil".format(rtlil_text))
     script.append("delete w:$verilog_initial_trigger")
-    script.append("write_cxxrtl")
+    options = []
+    if opt_level is not None:
+        options.append("-O{}".format(opt_level))
+    if not flatten:
+        options.append("-noflatten")
+    script.append(" ".join(["write_cxxrtl", *options]))
 
     return yosys.run(["-q", "-"], "\n".join(script), src_loc_at=1 + src_loc_at)
 
 
-def convert_fragment(*args, black_boxes=None, **kwargs):
+def convert_fragment(*args, black_boxes=None, opt_level=None, flatten=True, **kwargs):
     rtlil_text, name_map = rtlil.convert_fragment(*args, **kwargs)
-    return _convert_rtlil_text(rtlil_text, black_boxes, src_loc_at=1), name_map
+    return _convert_rtlil_text(rtlil_text, black_boxes,
+                               opt_level=opt_level, flatten=flatten, src_loc_at=1), name_map
 
 
-def convert(*args, black_boxes=None, **kwargs):
+def convert(*args, black_boxes=None, opt_level=None, flatten=True, **kwargs):
     rtlil_text = rtlil.convert(*args, **kwargs)
-    return _convert_rtlil_text(rtlil_text, black_boxes, src_loc_at=1)
+    return _convert_rtlil_text(rtlil_text, black_boxes,
+                               opt_level=opt_level, flatten=flatten, src_loc_at=1)
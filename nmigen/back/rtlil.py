@@ -507,6 +507,15 @@ class _RHSValueCompiler(_ValueCompiler):
         }, src=src(value.src_loc))
         return res
 
+    def on_ArrayProxy(self, value):
+        if not isinstance(self.s.expand(value.index), ast.Const):
+            # Selecting a part of the packed elements needs a single `$shift` cell, whereas
+            # legalizing the index duplicates the entire statement for every element.
+            part = value._as_part()
+            if part is not None:
+                return self(part)
+        return super().on_ArrayProxy(value)
+
     def match_shape(self, value, new_bits, new_sign):
         if isinstance(value, ast.Const):
             return self(ast.Const(value.value, ast.Shape(new_bits, new_sign)))
@@ -139,7 +139,7 @@ class If(ast.Switch):
 
     @deprecated("instead of `.Else(...)`, use `with m.Else(): ...`")
     def Else(self, *stmts):
-        self.cases[()] = ast.Statement.cast(stmts)
+        self.cases = OrderedDict((*self.cases.items(), ((), ast.Statement.cast(stmts))))
         return self
 
 
@@ -179,7 +179,7 @@ class Case(ast.Switch):
             key = ()
         else:
             key = ("{:0{}b}".format(ast.Value.cast(key).value, len(self.test)),)
-        stmts = self.cases[key]
-        del self.cases[key]
-        self.cases[()] = stmts
+        cases = OrderedDict(self.cases)
+        cases[()] = cases.pop(key)
+        self.cases = cases
         return self
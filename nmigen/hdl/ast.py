@@ -1,4 +1,7 @@
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+import functools
+from operator import attrgetter
 import traceback
 import warnings
 import typing
@@ -13,6 +16,7 @@ from .._unused import *
 
 __all__ = [
     "Shape", "signed", "unsigned",
+    "hash_consing",
     "Value", "Const", "C", "AnyConst", "AnySeq", "Operator", "Mux", "Part", "Slice", "Cat", "Repl",
     "Array", "ArrayProxy",
     "Signal", "ClockSignal", "ResetSignal",
@@ -26,6 +30,8 @@ __all__ = [
 
 class DUID:
     """Deterministic Unique IDentifier."""
+    __slots__ = ()
+
     __next_uid = 0
     def __init__(self):
         self.duid = DUID.__next_uid
@@ -128,7 +134,89 @@ def signed(width):
     return Shape(width, signed=True)
 
 
+# Incremented every time the shape of an existing signal changes, which invalidates every shape
+# cached by the expressions that (may) contain it.
+_shape_generation = 0
+
+
+def _invalidate_shapes():
+    global _shape_generation
+    _shape_generation += 1
+
+
+def _cached_shape(shape):
+    # Values using this decorator must have a `_shape_cache` slot initialized to `None`.
+    @functools.wraps(shape)
+    def cached_shape(self):
+        cache = self._shape_cache
+        if cache is None or cache[0] != _shape_generation:
+            cache = self._shape_cache = (_shape_generation, shape(self))
+        return cache[1]
+    return cached_shape
+
+
+# Maps the structure of every hash-consed value to the value itself, or `None` if values are not
+# being hash-consed.
+_hash_consed = None
+
+
+@contextmanager
+def hash_consing(enabled=True):
+    """Share structurally identical values.
+
+    While this context manager is active, constructing a :class:`Const`, or a :class:`Slice`
+    or :class:`Operator` that has the same operands as an existing one (such as ``sig[0]`` or
+    ``sig == 1``), returns the existing value instead of a new one. Every unique value is stored
+    only once, and two such values are equal if and only if they are the same object.
+
+    A shared value has the source location of the place where it was first constructed, even
+    if it is later reconstructed elsewhere (for example, by a transformer). Where accurate source
+    locations are important, hash-consing can be temporarily disabled by using
+    ``with hash_consing(enabled=False):``.
+
+    Every value constructed while hash-consing is enabled is kept alive until the outermost
+    context manager exits.
+    """
+    global _hash_consed
+    outer_hash_consed = _hash_consed
+    if not enabled:
+        _hash_consed = None
+    elif _hash_consed is None:
+        _hash_consed = {}
+    # Constructing a value normally does not involve any Python code other than the constructor
+    # itself; the hook is only installed while it may be needed.
+    outermost = "__call__" not in _HashConsedMeta.__dict__
+    if outermost:
+        _HashConsedMeta.__call__ = _HashConsedMeta._hash_consed_call
+    try:
+        yield
+    finally:
+        _hash_consed = outer_hash_consed
+        if outermost:
+            del _HashConsedMeta.__call__
+
+
+class _HashConsedMeta(ABCMeta):
+    def _hash_consed_call(cls, *args, src_loc_at=0, **kwargs):
+        # This method adds a stack frame between the constructor and its caller.
+        value = type.__call__(cls, *args, src_loc_at=1 + src_loc_at, **kwargs)
+        if _hash_consed is None:
+            return value
+        value = _hash_consed.setdefault(value._hash_cons_key(), value)
+        value._shared = True
+        return value
+
+
+def _set_src_loc(value, src_loc):
+    # A value shared by hash-consing may be a part of many unrelated expressions, so it keeps
+    # the source location of the place where it was first constructed.
+    if not getattr(value, "_shared", False):
+        value.src_loc = src_loc
+
+
 class Value(metaclass=ABCMeta):
+    __slots__ = ("src_loc",)
+
     @staticmethod
     def cast(obj):
         """Converts ``obj`` to an nMigen value.
@@ -564,7 +652,7 @@ class Value(metaclass=ABCMeta):
 
 
 @final
-class Const(Value):
+class Const(Value, metaclass=_HashConsedMeta):
     """A constant, literal integer value.
 
     Parameters
@@ -580,19 +668,20 @@ class Const(Value):
     width : int
     signed : bool
     """
-    src_loc = None
+    __slots__ = ("value", "width", "signed", "_shared")
 
     @staticmethod
     def normalize(value, shape):
         width, signed = shape
         mask = (1 << width) - 1
         value &= mask
-        if signed and value >> (width - 1):
+        if signed and width > 0 and value >> (width - 1):
             value |= ~mask
         return value
 
     def __init__(self, value, shape=None, *, src_loc_at=0):
         # We deliberately do not call Value.__init__ here.
+        self.src_loc = None
         self.value = int(value)
         if shape is None:
             shape = Shape(bits_for(self.value), signed=self.value < 0)
@@ -607,11 +696,14 @@ class Const(Value):
         return Shape(self.width, self.signed)
 
     def _rhs_signals(self):
-        return SignalSet()
+        return _EMPTY_SIGNAL_SET
 
     def _as_const(self):
         return self.value
 
+    def _hash_cons_key(self):
+        return (Const, self.value, self.width, self.signed)
+
     def __repr__(self):
         return "(const {}'{}d{})".format(self.width, "s" if self.signed else "", self.value)
 
@@ -620,6 +712,8 @@ C = Const  # shorthand
 
 
 class AnyValue(Value, DUID):
+    __slots__ = ("duid", "width", "signed")
+
     def __init__(self, shape, *, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
         self.width, self.signed = Shape.cast(shape, src_loc_at=1 + src_loc_at)
@@ -631,28 +725,39 @@ class AnyValue(Value, DUID):
         return Shape(self.width, self.signed)
 
     def _rhs_signals(self):
-        return SignalSet()
+        return _EMPTY_SIGNAL_SET
 
 
 @final
 class AnyConst(AnyValue):
+    __slots__ = ()
+
     def __repr__(self):
         return "(anyconst {}'{})".format(self.width, "s" if self.signed else "")
 
 
 @final
 class AnySeq(AnyValue):
+    __slots__ = ()
+
     def __repr__(self):
         return "(anyseq {}'{})".format(self.width, "s" if self.signed else "")
 
 
 @final
-class Operator(Value):
+class Operator(Value, metaclass=_HashConsedMeta):
+    __slots__ = ("operator", "operands", "_shape_cache", "_rhs_signals_cache", "_hash_cache",
+                 "_shared")
+
     def __init__(self, operator, operands, *, src_loc_at=0):
         super().__init__(src_loc_at=1 + src_loc_at)
         self.operator = operator
         self.operands = [Value.cast(op) for op in operands]
+        self._shape_cache = None
+        self._rhs_signals_cache = None
+        self._hash_cache = None
 
+    @_cached_shape
     def shape(self):
         def _bitwise_binary_shape(a_shape, b_shape):
             a_bits, a_sign = a_shape
@@ -670,7 +775,9 @@ class Operator(Value):
                 # first signed, second operand unsigned (add sign bit)
                 return Shape(max(a_bits, b_bits + 1), True)
 
-        op_shapes = list(map(lambda x: x.shape(), self.operands))
+        op_shapes = []
+        for operand in self.operands:
+            op_shapes.append(operand.shape())
         if len(op_shapes) == 1:
             (a_width, a_signed), = op_shapes
             if self.operator in ("+", "~"):
@@ -717,7 +824,13 @@ class Operator(Value):
                                   .format(self.operator, len(op_shapes))) # :nocov:
 
     def _rhs_signals(self):
-        return union(op._rhs_signals() for op in self.operands)
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals(op._rhs_signals() for op in self.operands)
+        return self._rhs_signals_cache
+
+    def _hash_cons_key(self):
+        # The operands are kept alive by the value, so their identities are not reused.
+        return (Operator, self.operator, *map(id, self.operands))
 
     def __repr__(self):
         return "({} {})".format(self.operator, " ".join(map(repr, self.operands)))
@@ -746,7 +859,9 @@ def Mux(sel, val1, val0):
 
 
 @final
-class Slice(Value):
+class Slice(Value, metaclass=_HashConsedMeta):
+    __slots__ = ("value", "start", "stop", "_hash_cache", "_shared")
+
     def __init__(self, value, start, stop, *, src_loc_at=0):
         if not isinstance(start, int):
             raise TypeError("Slice start must be an integer, not {!r}".format(start))
@@ -769,6 +884,7 @@ class Slice(Value):
         self.value = Value.cast(value)
         self.start = start
         self.stop  = stop
+        self._hash_cache = None
 
     def shape(self):
         return Shape(self.stop - self.start)
@@ -779,12 +895,17 @@ class Slice(Value):
     def _rhs_signals(self):
         return self.value._rhs_signals()
 
+    def _hash_cons_key(self):
+        return (Slice, id(self.value), self.start, self.stop)
+
     def __repr__(self):
         return "(slice {} {}:{})".format(repr(self.value), self.start, self.stop)
 
 
 @final
 class Part(Value):
+    __slots__ = ("value", "offset", "width", "stride", "_rhs_signals_cache", "_hash_cache")
+
     def __init__(self, value, offset, width, stride=1, *, src_loc_at=0):
         if not isinstance(width, int) or width < 0:
             raise TypeError("Part width must be a non-negative integer, not {!r}".format(width))
@@ -796,6 +917,8 @@ class Part(Value):
         self.offset = Value.cast(offset)
         self.width  = width
         self.stride = stride
+        self._rhs_signals_cache = None
+        self._hash_cache = None
 
     def shape(self):
         return Shape(self.width)
@@ -804,7 +927,10 @@ class Part(Value):
         return self.value._lhs_signals()
 
     def _rhs_signals(self):
-        return self.value._rhs_signals() | self.offset._rhs_signals()
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals((self.value._rhs_signals(),
+                                                      self.offset._rhs_signals()))
+        return self._rhs_signals_cache
 
     def __repr__(self):
         return "(part {} {} {} {})".format(repr(self.value), repr(self.offset),
@@ -836,24 +962,36 @@ class Cat(Value):
     Value, inout
         Resulting ``Value`` obtained by concatentation.
     """
+    __slots__ = ("parts", "_shape_cache", "_lhs_signals_cache", "_rhs_signals_cache",
+                 "_hash_cache")
+
     def __init__(self, *args, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
         self.parts = [Value.cast(v) for v in flatten(args)]
+        self._shape_cache = None
+        self._lhs_signals_cache = None
+        self._rhs_signals_cache = None
+        self._hash_cache = None
 
+    @_cached_shape
     def shape(self):
         return Shape(sum(len(part) for part in self.parts))
 
     def _lhs_signals(self):
-        return union((part._lhs_signals() for part in self.parts), start=SignalSet())
+        if self._lhs_signals_cache is None:
+            self._lhs_signals_cache = _union_signals(part._lhs_signals() for part in self.parts)
+        return self._lhs_signals_cache
 
     def _rhs_signals(self):
-        return union((part._rhs_signals() for part in self.parts), start=SignalSet())
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals(part._rhs_signals() for part in self.parts)
+        return self._rhs_signals_cache
 
     def _as_const(self):
         value = 0
         for part in reversed(self.parts):
             value <<= len(part)
-            value |= part._as_const()
+            value |= part._as_const() & ((1 << len(part)) - 1)
         return value
 
     def __repr__(self):
@@ -881,6 +1019,8 @@ class Repl(Value):
     Repl, out
         Replicated value.
     """
+    __slots__ = ("value", "count", "_shape_cache", "_hash_cache")
+
     def __init__(self, value, count, *, src_loc_at=0):
         if not isinstance(count, int) or count < 0:
             raise TypeError("Replication count must be a non-negative integer, not {!r}"
@@ -889,7 +1029,10 @@ class Repl(Value):
         super().__init__(src_loc_at=src_loc_at)
         self.value = Value.cast(value)
         self.count = count
+        self._shape_cache = None
+        self._hash_cache = None
 
+    @_cached_shape
     def shape(self):
         return Shape(len(self.value) * self.count)
 
@@ -942,9 +1085,14 @@ class Signal(Value, DUID):
     decoder : function
     """
 
+    __slots__ = ("duid", "name", "_width", "_signed", "reset", "reset_less", "attrs", "decoder",
+                 "_enum_class", "_signals_cache", "_signal_key")
+
     def __init__(self, shape=None, *, name=None, reset=0, reset_less=False,
                  attrs=None, decoder=None, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
+        self._signals_cache = None
+        self._signal_key = None
 
         if name is not None and not isinstance(name, str):
             raise TypeError("Name must be a string, not {!r}".format(name))
@@ -952,7 +1100,7 @@ class Signal(Value, DUID):
 
         if shape is None:
             shape = unsigned(1)
-        self.width, self.signed = Shape.cast(shape, src_loc_at=1 + src_loc_at)
+        self._width, self._signed = Shape.cast(shape, src_loc_at=1 + src_loc_at)
 
         if isinstance(reset, Enum):
             reset = reset.value
@@ -985,6 +1133,19 @@ class Signal(Value, DUID):
             self.decoder = decoder
             self._enum_class = None
 
+    # The shape of a signal may be changed after it is used in expressions (e.g. by an FSM, once
+    # the number of its states is known), so changing it invalidates every cached shape.
+    def _set_width(self, width):
+        self._width = width
+        _invalidate_shapes()
+
+    def _set_signed(self, signed):
+        self._signed = signed
+        _invalidate_shapes()
+
+    width  = property(attrgetter("_width"),  _set_width)
+    signed = property(attrgetter("_signed"), _set_signed)
+
     # Not a @classmethod because nmigen.compat requires it.
     @staticmethod
     def like(other, *, name=None, name_suffix=None, src_loc_at=0, **kwargs):
@@ -1012,10 +1173,11 @@ class Signal(Value, DUID):
         return Shape(self.width, self.signed)
 
     def _lhs_signals(self):
-        return SignalSet((self,))
+        if self._signals_cache is None:
+            self._signals_cache = _FrozenSignalSet((self,))
+        return self._signals_cache
 
-    def _rhs_signals(self):
-        return SignalSet((self,))
+    _rhs_signals = _lhs_signals
 
     def __repr__(self):
         return "(sig {})".format(self.name)
@@ -1034,6 +1196,8 @@ class ClockSignal(Value):
     domain : str
         Clock domain to obtain a clock signal for. Defaults to ``"sync"``.
     """
+    __slots__ = ("domain", "_signal_key")
+
     def __init__(self, domain="sync", *, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
         if not isinstance(domain, str):
@@ -1041,12 +1205,13 @@ class ClockSignal(Value):
         if domain == "comb":
             raise ValueError("Domain '{}' does not have a clock".format(domain))
         self.domain = domain
+        self._signal_key = None
 
     def shape(self):
         return Shape(1)
 
     def _lhs_signals(self):
-        return SignalSet((self,))
+        return _FrozenSignalSet((self,))
 
     def _rhs_signals(self):
         raise NotImplementedError("ClockSignal must be lowered to a concrete signal") # :nocov:
@@ -1070,6 +1235,8 @@ class ResetSignal(Value):
     allow_reset_less : bool
         If the clock domain is reset-less, act as a constant ``0`` instead of reporting an error.
     """
+    __slots__ = ("domain", "allow_reset_less", "_signal_key")
+
     def __init__(self, domain="sync", allow_reset_less=False, *, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
         if not isinstance(domain, str):
@@ -1077,13 +1244,14 @@ class ResetSignal(Value):
         if domain == "comb":
             raise ValueError("Domain '{}' does not have a reset".format(domain))
         self.domain = domain
+        self._signal_key = None
         self.allow_reset_less = allow_reset_less
 
     def shape(self):
         return Shape(1)
 
     def _lhs_signals(self):
-        return SignalSet((self,))
+        return _FrozenSignalSet((self,))
 
     def _rhs_signals(self):
         raise NotImplementedError("ResetSignal must be lowered to a concrete signal") # :nocov:
@@ -1160,6 +1328,9 @@ class Array(MutableSequence):
 
     def _check_mutability(self):
         if not self._mutable:
+            if self._proxy_at is None:
+                raise ValueError("Array can no longer be mutated after it was indexed with "
+                                 "a value")
             raise ValueError("Array can no longer be mutated after it was indexed with a value "
                              "at {}:{}".format(*self._proxy_at))
 
@@ -1182,10 +1353,17 @@ class Array(MutableSequence):
 
 @final
 class ArrayProxy(Value):
+    __slots__ = ("elems", "index", "_shape_cache", "_lhs_signals_cache", "_rhs_signals_cache",
+                 "_hash_cache")
+
     def __init__(self, elems, index, *, src_loc_at=0):
         super().__init__(src_loc_at=1 + src_loc_at)
         self.elems = elems
         self.index = Value.cast(index)
+        self._shape_cache = None
+        self._lhs_signals_cache = None
+        self._rhs_signals_cache = None
+        self._hash_cache = None
 
     def __getattr__(self, attr):
         return ArrayProxy([getattr(elem, attr) for elem in self.elems], self.index)
@@ -1196,6 +1374,7 @@ class ArrayProxy(Value):
     def _iter_as_values(self):
         return (Value.cast(elem) for elem in self.elems)
 
+    @_cached_shape
     def shape(self):
         unsigned_width = signed_width = 0
         has_unsigned = has_signed = False
@@ -1220,14 +1399,50 @@ class ArrayProxy(Value):
             return Shape(max(unsigned_width, signed_width), has_signed)
 
     def _lhs_signals(self):
-        signals = union((elem._lhs_signals() for elem in self._iter_as_values()),
-                        start=SignalSet())
-        return signals
+        if self._lhs_signals_cache is None:
+            self._lhs_signals_cache = \
+                _union_signals(elem._lhs_signals() for elem in self._iter_as_values())
+        return self._lhs_signals_cache
 
     def _rhs_signals(self):
-        signals = union((elem._rhs_signals() for elem in self._iter_as_values()),
-                        start=SignalSet())
-        return self.index._rhs_signals() | signals
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals((
+                self.index._rhs_signals(),
+                *(elem._rhs_signals() for elem in self._iter_as_values())
+            ))
+        return self._rhs_signals_cache
+
+    def _as_part(self):
+        # If every element has the shape of the proxy (constants can always be given that shape),
+        # the proxy selects a part of the concatenation of the elements. Returns that part, or
+        # None if the elements cannot be packed.
+        width, signed = shape = self.shape()
+        if not self.elems or width == 0:
+            return None
+        elems = []
+        for elem in self._iter_as_values():
+            if type(elem) is Const:
+                elem = Const(elem.value, shape)
+            elif elem.shape() != shape:
+                return None
+            elems.append(elem)
+        if all(type(elem) is Const for elem in elems):
+            packed = Const(Cat(elems)._as_const(), unsigned(width * len(elems)))
+        else:
+            packed = Cat(elems)
+            _set_src_loc(packed, self.src_loc)
+        index = self.index
+        if index.shape().signed:
+            index = index.as_unsigned()
+        if 1 << len(index) > len(elems):
+            # Out of bounds indexes select the last element.
+            in_bounds = index < len(elems)
+            _set_src_loc(in_bounds, self.src_loc)
+            index = Mux(in_bounds, index, len(elems) - 1)
+            _set_src_loc(index, self.src_loc)
+        part = Part(packed, index, width, stride=width)
+        _set_src_loc(part, self.src_loc)
+        return part
 
     def __repr__(self):
         return "(proxy (array [{}]) {!r})".format(", ".join(map(repr, self.elems)), self.index)
@@ -1288,11 +1503,14 @@ class Sample(Value):
     of the ``domain`` clock back. If that moment is before the beginning of time, it is equal
     to the value of the expression calculated as if each signal had its reset value.
     """
+    __slots__ = ("value", "clocks", "domain", "_hash_cache")
+
     def __init__(self, expr, clocks, domain, *, src_loc_at=0):
         super().__init__(src_loc_at=1 + src_loc_at)
         self.value  = Value.cast(expr)
         self.clocks = int(clocks)
         self.domain = domain
+        self._hash_cache = None
         if not isinstance(self.value, (Const, Signal, ClockSignal, ResetSignal, Initial)):
             raise TypeError("Sampled value must be a signal or a constant, not {!r}"
                             .format(self.value))
@@ -1307,7 +1525,7 @@ class Sample(Value):
         return self.value.shape()
 
     def _rhs_signals(self):
-        return SignalSet((self,))
+        return _FrozenSignalSet((self,))
 
     def __repr__(self):
         return "(sample {!r} @ {}[{}])".format(
@@ -1336,6 +1554,8 @@ class Initial(Value):
 
     An ``Initial`` signal is ``1`` at the first cycle of model checking, and ``0`` at any other.
     """
+    __slots__ = ()
+
     def __init__(self, *, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
 
@@ -1343,7 +1563,7 @@ class Initial(Value):
         return Shape(1)
 
     def _rhs_signals(self):
-        return SignalSet((self,))
+        return _FrozenSignalSet((self,))
 
     def __repr__(self):
         return "(initial)"
@@ -1355,6 +1575,8 @@ class _StatementList(list):
 
 
 class Statement:
+    __slots__ = ("src_loc",)
+
     def __init__(self, *, src_loc_at=0):
         self.src_loc = tracer.get_src_loc(1 + src_loc_at)
 
@@ -1371,16 +1593,22 @@ class Statement:
 
 @final
 class Assign(Statement):
+    __slots__ = ("lhs", "rhs", "_rhs_signals_cache")
+
     def __init__(self, lhs, rhs, *, src_loc_at=0):
         super().__init__(src_loc_at=src_loc_at)
         self.lhs = Value.cast(lhs)
         self.rhs = Value.cast(rhs)
+        self._rhs_signals_cache = None
 
     def _lhs_signals(self):
         return self.lhs._lhs_signals()
 
     def _rhs_signals(self):
-        return self.lhs._rhs_signals() | self.rhs._rhs_signals()
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals((self.lhs._rhs_signals(),
+                                                      self.rhs._rhs_signals()))
+        return self._rhs_signals_cache
 
     def __repr__(self):
         return "(eq {!r} {!r})".format(self.lhs, self.rhs)
@@ -1406,7 +1634,7 @@ class Property(Statement, MustUse):
             self._en.src_loc = self.src_loc
 
     def _lhs_signals(self):
-        return SignalSet((self._en, self._check))
+        return _FrozenSignalSet((self._en, self._check))
 
     def _rhs_signals(self):
         return self.test._rhs_signals()
@@ -1432,6 +1660,8 @@ class Cover(Property):
 
 # @final
 class Switch(Statement):
+    __slots__ = ("_test", "_cases", "case_src_locs", "_lhs_signals_cache", "_rhs_signals_cache")
+
     def __init__(self, test, cases, *, src_loc=None, src_loc_at=0, case_src_locs={}):
         if src_loc is None:
             super().__init__(src_loc_at=src_loc_at)
@@ -1472,15 +1702,32 @@ class Switch(Statement):
             if orig_keys in case_src_locs:
                 self.case_src_locs[new_keys] = case_src_locs[orig_keys]
 
+    # The signals used by a switch are cached, and the cache is only invalidated when `test` or
+    # `cases` is replaced; the cases must not be modified in place afterwards.
+    def _set_test(self, test):
+        self._test = test
+        self._lhs_signals_cache = self._rhs_signals_cache = None
+
+    def _set_cases(self, cases):
+        self._cases = cases
+        self._lhs_signals_cache = self._rhs_signals_cache = None
+
+    test  = property(attrgetter("_test"),  _set_test)
+    cases = property(attrgetter("_cases"), _set_cases)
+
     def _lhs_signals(self):
-        signals = union((s._lhs_signals() for ss in self.cases.values() for s in ss),
-                        start=SignalSet())
-        return signals
+        if self._lhs_signals_cache is None:
+            self._lhs_signals_cache = \
+                _union_signals(s._lhs_signals() for ss in self.cases.values() for s in ss)
+        return self._lhs_signals_cache
 
     def _rhs_signals(self):
-        signals = union((s._rhs_signals() for ss in self.cases.values() for s in ss),
-                        start=SignalSet())
-        return self.test._rhs_signals() | signals
+        if self._rhs_signals_cache is None:
+            self._rhs_signals_cache = _union_signals((
+                self.test._rhs_signals(),
+                *(s._rhs_signals() for ss in self.cases.values() for s in ss)
+            ))
+        return self._rhs_signals_cache
 
     def __repr__(self):
         def case_repr(keys, stmts):
@@ -1507,9 +1754,8 @@ class _MappedKeyCollection(metaclass=ABCMeta):
 
 class _MappedKeyDict(MutableMapping, _MappedKeyCollection):
     def __init__(self, pairs=()):
-        self._storage = OrderedDict()
-        for key, value in pairs:
-            self[key] = value
+        self._storage = {}
+        self.update(pairs)
 
     def __getitem__(self, key):
         key = None if key is None else self._map_key(key)
@@ -1530,6 +1776,14 @@ class _MappedKeyDict(MutableMapping, _MappedKeyCollection):
             else:
                 yield self._unmap_key(key)
 
+    def update(self, *args, **kwargs):
+        if (len(args) == 1 and not kwargs and isinstance(args[0], _MappedKeyDict) and
+                type(args[0])._map_key is type(self)._map_key):
+            # The keys are already mapped; copy them without unmapping and mapping them again.
+            self._storage.update(args[0]._storage)
+        else:
+            super().update(*args, **kwargs)
+
     def __eq__(self, other):
         if not isinstance(other, type(self)):
             return False
@@ -1553,27 +1807,53 @@ class _MappedKeyDict(MutableMapping, _MappedKeyCollection):
 
 class _MappedKeySet(MutableSet, _MappedKeyCollection):
     def __init__(self, elements=()):
-        self._storage = OrderedDict()
-        for elem in elements:
-            self.add(elem)
+        self._storage = {}
+        self.update(elements)
+
+    def _same_keys(self, other):
+        return (isinstance(other, _MappedKeySet) and
+                type(other)._map_key is type(self)._map_key)
 
     def add(self, value):
         self._storage[self._map_key(value)] = None
 
     def update(self, values):
-        for value in values:
-            self.add(value)
+        if self._same_keys(values):
+            # The keys are already mapped; copy them without unmapping and mapping them again.
+            self._storage.update(values._storage)
+        else:
+            map_key = self._map_key
+            self._storage.update((map_key(value), None) for value in values)
 
     def discard(self, value):
-        if value in self:
-            del self._storage[self._map_key(value)]
+        self._storage.pop(self._map_key(value), None)
 
     def __contains__(self, value):
         return self._map_key(value) in self._storage
 
     def __iter__(self):
-        for key in [k for k in self._storage]:
-            yield self._unmap_key(key)
+        # The keys are unmapped upfront, so that the set may be modified while iterating over it.
+        return iter([self._unmap_key(key) for key in self._storage])
+
+    def __or__(self, other):
+        if not self._same_keys(other):
+            return super().__or__(other)
+        result = self._from_iterable(())
+        result._storage.update(self._storage)
+        result._storage.update(other._storage)
+        return result
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __sub__(self, other):
+        if not self._same_keys(other):
+            return super().__sub__(other)
+        result = self._from_iterable(())
+        result._storage.update((key, None) for key in self._storage
+                               if key not in other._storage)
+        return result
 
     def __len__(self):
         return len(self._storage)
@@ -1583,35 +1863,92 @@ class _MappedKeySet(MutableSet, _MappedKeyCollection):
                                   ", ".join(repr(x) for x in self))
 
 
+def _structural_hash(value):
+    # The hashes of compound values are computed once, and cached by the value itself.
+    if isinstance(value, Const):
+        return hash(value.value)
+    elif isinstance(value, (Signal, AnyValue)):
+        return hash(value.duid)
+    elif isinstance(value, (ClockSignal, ResetSignal)):
+        return hash(value.domain)
+    elif isinstance(value, Initial):
+        return 0
+    elif not isinstance(value, (Operator, Slice, Part, Cat, Repl, ArrayProxy, Sample)):
+        raise TypeError("Object {!r} cannot be used as a key in value collections"
+                        .format(value))
+    if value._hash_cache is None:
+        if isinstance(value, Operator):
+            value._hash_cache = hash((value.operator,
+                                      *(_structural_hash(o) for o in value.operands)))
+        elif isinstance(value, Slice):
+            value._hash_cache = hash((_structural_hash(value.value), value.start, value.stop))
+        elif isinstance(value, Part):
+            value._hash_cache = hash((_structural_hash(value.value),
+                                      _structural_hash(value.offset),
+                                      value.width, value.stride))
+        elif isinstance(value, Cat):
+            value._hash_cache = hash(tuple(_structural_hash(o) for o in value.parts))
+        elif isinstance(value, Repl):
+            value._hash_cache = hash((_structural_hash(value.value), value.count))
+        elif isinstance(value, ArrayProxy):
+            value._hash_cache = hash((_structural_hash(value.index),
+                                      *(_structural_hash(e) for e in value._iter_as_values())))
+        elif isinstance(value, Sample):
+            value._hash_cache = hash((_structural_hash(value.value), value.clocks, value.domain))
+    return value._hash_cache
+
+
+def _structural_eq(a, b):
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if _structural_hash(a) != _structural_hash(b):
+        return False
+
+    if isinstance(a, Const):
+        return a.value == b.value and a.width == b.width and a.signed == b.signed
+    elif isinstance(a, (Signal, AnyValue)):
+        return False
+    elif isinstance(a, (ClockSignal, ResetSignal)):
+        return a.domain == b.domain
+    elif isinstance(a, Operator):
+        return (a.operator == b.operator and
+                len(a.operands) == len(b.operands) and
+                all(_structural_eq(x, y) for x, y in zip(a.operands, b.operands)))
+    elif isinstance(a, Slice):
+        return (a.start == b.start and a.stop == b.stop and
+                _structural_eq(a.value, b.value))
+    elif isinstance(a, Part):
+        return (a.width == b.width and a.stride == b.stride and
+                _structural_eq(a.value, b.value) and
+                _structural_eq(a.offset, b.offset))
+    elif isinstance(a, Cat):
+        return (len(a.parts) == len(b.parts) and
+                all(_structural_eq(x, y) for x, y in zip(a.parts, b.parts)))
+    elif isinstance(a, Repl):
+        return a.count == b.count and _structural_eq(a.value, b.value)
+    elif isinstance(a, ArrayProxy):
+        return (len(a.elems) == len(b.elems) and
+                _structural_eq(a.index, b.index) and
+                all(_structural_eq(x, y)
+                    for x, y in zip(a._iter_as_values(), b._iter_as_values())))
+    elif isinstance(a, Sample):
+        return (a.clocks == b.clocks and a.domain == b.domain and
+                _structural_eq(a.value, b.value))
+    elif isinstance(a, Initial):
+        return True
+    else: # :nocov:
+        raise TypeError("Object {!r} cannot be used as a key in value collections"
+                        .format(a))
+
+
 class ValueKey:
+    __slots__ = ("value", "_hash")
+
     def __init__(self, value):
         self.value = Value.cast(value)
-        if isinstance(self.value, Const):
-            self._hash = hash(self.value.value)
-        elif isinstance(self.value, (Signal, AnyValue)):
-            self._hash = hash(self.value.duid)
-        elif isinstance(self.value, (ClockSignal, ResetSignal)):
-            self._hash = hash(self.value.domain)
-        elif isinstance(self.value, Operator):
-            self._hash = hash((self.value.operator,
-                               tuple(ValueKey(o) for o in self.value.operands)))
-        elif isinstance(self.value, Slice):
-            self._hash = hash((ValueKey(self.value.value), self.value.start, self.value.stop))
-        elif isinstance(self.value, Part):
-            self._hash = hash((ValueKey(self.value.value), ValueKey(self.value.offset),
-                              self.value.width, self.value.stride))
-        elif isinstance(self.value, Cat):
-            self._hash = hash(tuple(ValueKey(o) for o in self.value.parts))
-        elif isinstance(self.value, ArrayProxy):
-            self._hash = hash((ValueKey(self.value.index),
-                              tuple(ValueKey(e) for e in self.value._iter_as_values())))
-        elif isinstance(self.value, Sample):
-            self._hash = hash((ValueKey(self.value.value), self.value.clocks, self.value.domain))
-        elif isinstance(self.value, Initial):
-            self._hash = 0
-        else: # :nocov:
-            raise TypeError("Object {!r} cannot be used as a key in value collections"
-                            .format(self.value))
+        self._hash = _structural_hash(self.value)
 
     def __hash__(self):
         return self._hash
@@ -1619,47 +1956,7 @@ class ValueKey:
     def __eq__(self, other):
         if type(other) is not ValueKey:
             return False
-        if type(self.value) is not type(other.value):
-            return False
-
-        if isinstance(self.value, Const):
-            return self.value.value == other.value.value
-        elif isinstance(self.value, (Signal, AnyValue)):
-            return self.value is other.value
-        elif isinstance(self.value, (ClockSignal, ResetSignal)):
-            return self.value.domain == other.value.domain
-        elif isinstance(self.value, Operator):
-            return (self.value.operator == other.value.operator and
-                    len(self.value.operands) == len(other.value.operands) and
-                    all(ValueKey(a) == ValueKey(b)
-                        for a, b in zip(self.value.operands, other.value.operands)))
-        elif isinstance(self.value, Slice):
-            return (ValueKey(self.value.value) == ValueKey(other.value.value) and
-                    self.value.start == other.value.start and
-                    self.value.stop == other.value.stop)
-        elif isinstance(self.value, Part):
-            return (ValueKey(self.value.value) == ValueKey(other.value.value) and
-                    ValueKey(self.value.offset) == ValueKey(other.value.offset) and
-                    self.value.width == other.value.width and
-                    self.value.stride == other.value.stride)
-        elif isinstance(self.value, Cat):
-            return all(ValueKey(a) == ValueKey(b)
-                        for a, b in zip(self.value.parts, other.value.parts))
-        elif isinstance(self.value, ArrayProxy):
-            return (ValueKey(self.value.index) == ValueKey(other.value.index) and
-                    len(self.value.elems) == len(other.value.elems) and
-                    all(ValueKey(a) == ValueKey(b)
-                        for a, b in zip(self.value._iter_as_values(),
-                                        other.value._iter_as_values())))
-        elif isinstance(self.value, Sample):
-            return (ValueKey(self.value.value) == ValueKey(other.value.value) and
-                    self.value.clocks == other.value.clocks and
-                    self.value.domain == self.value.domain)
-        elif isinstance(self.value, Initial):
-            return True
-        else: # :nocov:
-            raise TypeError("Object {!r} cannot be used as a key in value collections"
-                            .format(self.value))
+        return self._hash == other._hash and _structural_eq(self.value, other.value)
 
     def __lt__(self, other):
         if not isinstance(other, ValueKey):
@@ -1668,13 +1965,15 @@ class ValueKey:
             return False
 
         if isinstance(self.value, Const):
-            return self.value < other.value
+            return self.value.value < other.value.value
         elif isinstance(self.value, (Signal, AnyValue)):
             return self.value.duid < other.value.duid
         elif isinstance(self.value, Slice):
-            return (ValueKey(self.value.value) < ValueKey(other.value.value) and
-                    self.value.start < other.value.start and
-                    self.value.end < other.value.end)
+            self_inner, other_inner = ValueKey(self.value.value), ValueKey(other.value.value)
+            if self_inner == other_inner:
+                return ((self.value.start, self.value.stop) <
+                        (other.value.start, other.value.stop))
+            return self_inner < other_inner
         else: # :nocov:
             raise TypeError("Object {!r} cannot be used as a key in value collections")
 
@@ -1684,15 +1983,17 @@ class ValueKey:
 
 class ValueDict(_MappedKeyDict):
     _map_key   = ValueKey
-    _unmap_key = lambda self, key: key.value
+    _unmap_key = attrgetter("value")
 
 
 class ValueSet(_MappedKeySet):
     _map_key   = ValueKey
-    _unmap_key = lambda self, key: key.value
+    _unmap_key = attrgetter("value")
 
 
 class SignalKey:
+    __slots__ = ("signal", "_intern", "_hash")
+
     def __init__(self, signal):
         self.signal = signal
         if isinstance(signal, Signal):
@@ -1703,9 +2004,10 @@ class SignalKey:
             self._intern = (2, signal.domain)
         else:
             raise TypeError("Object {!r} is not an nMigen signal".format(signal))
+        self._hash = hash(self._intern)
 
     def __hash__(self):
-        return hash(self._intern)
+        return self._hash
 
     def __eq__(self, other):
         if type(other) is not SignalKey:
@@ -1714,18 +2016,77 @@ class SignalKey:
 
     def __lt__(self, other):
         if type(other) is not SignalKey:
-            raise TypeError("Object {!r} cannot be compared to a SignalKey".format(signal))
+            raise TypeError("Object {!r} cannot be compared to a SignalKey".format(other))
         return self._intern < other._intern
 
     def __repr__(self):
         return "<{}.SignalKey {!r}>".format(__name__, self.signal)
 
 
+def _get_signal_key(signal):
+    # Every signal creates its key once, when it is first used in a signal-keyed collection,
+    # and keeps it; since the key is always the same object, looking it up in a dict only
+    # requires comparing identities.
+    if isinstance(signal, (Signal, ClockSignal, ResetSignal)):
+        key = signal._signal_key
+        if key is None:
+            key = signal._signal_key = SignalKey(signal)
+        return key
+    return SignalKey(signal)
+
+
 class SignalDict(_MappedKeyDict):
-    _map_key   = SignalKey
-    _unmap_key = lambda self, key: key.signal
+    _map_key   = staticmethod(_get_signal_key)
+    _unmap_key = attrgetter("signal")
 
 
 class SignalSet(_MappedKeySet):
-    _map_key   = SignalKey
-    _unmap_key = lambda self, key: key.signal
+    _map_key   = staticmethod(_get_signal_key)
+    _unmap_key = attrgetter("signal")
+
+
+class _FrozenSignalSet(SignalSet):
+    # Signal sets cached by values and statements are shared between all of their users, and
+    # cannot be modified. The results of set operations on them are ordinary signal sets.
+    def __init__(self, elements=()):
+        map_key = self._map_key
+        self._storage = {map_key(elem): None for elem in elements}
+
+    @classmethod
+    def _from_iterable(cls, elements):
+        return SignalSet(elements)
+
+    def add(self, value):
+        raise TypeError("Cannot modify a frozen signal set")
+
+    def update(self, values):
+        raise TypeError("Cannot modify a frozen signal set")
+
+    def discard(self, value):
+        raise TypeError("Cannot modify a frozen signal set")
+
+
+_EMPTY_SIGNAL_SET = _FrozenSignalSet()
+
+
+def _union_signals(signal_sets):
+    # Whenever the first set includes every other one (e.g. for `a + 1` or `a[0:2]`), it is
+    # returned as-is, so that the signal sets of nested expressions are shared.
+    result = None
+    merged = None
+    for signals in signal_sets:
+        if result is None:
+            result = signals
+        elif not signals._storage.keys() <= result._storage.keys():
+            if merged is None:
+                merged = _FrozenSignalSet()
+                merged._storage.update(result._storage)
+                result = merged
+            merged._storage.update(signals._storage)
+    if result is None:
+        return _EMPTY_SIGNAL_SET
+    if not isinstance(result, _FrozenSignalSet):
+        merged = _FrozenSignalSet()
+        merged._storage.update(result._storage)
+        result = merged
+    return result
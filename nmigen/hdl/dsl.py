@@ -489,7 +489,8 @@ class Module(_ModuleBuilderRoot, Elaboratable):
                     "Only assignments and property checks may be appended to d.{}"
                     .format(domain_name(domain)))
 
-            stmt._MustUse__used = True
+            if isinstance(stmt, Property):
+                stmt._MustUse__used = True
             stmt = SampleDomainInjector(domain)(stmt)
 
             for signal in stmt._lhs_signals():
@@ -30,12 +30,20 @@ class Fragment:
     @staticmethod
     def get(obj, platform):
         code = None
+        origins = []
         while True:
             if isinstance(obj, Fragment):
+                # The same fragment may be returned by several calls to `Fragment.get` (e.g. if
+                # an elaboratable caches it), so only record origins that are not known yet.
+                origins = [origin for origin in origins
+                           if not any(origin is known for known in obj.origins)]
+                if origins:
+                    obj.origins = (*origins, *obj.origins)
                 return obj
             elif isinstance(obj, Elaboratable):
                 code = obj.elaborate.__code__
                 obj._MustUse__used = True
+                origins.append(obj)
                 obj = obj.elaborate(platform)
             elif hasattr(obj, "elaborate"):
                 warnings.warn(
@@ -45,6 +53,7 @@ class Fragment:
                     category=RuntimeWarning,
                     stacklevel=2)
                 code = obj.elaborate.__code__
+                origins.append(obj)
                 obj = obj.elaborate(platform)
             else:
                 raise AttributeError("Object {!r} cannot be elaborated".format(obj))
@@ -64,6 +73,8 @@ class Fragment:
         self.attrs = OrderedDict()
         self.generated = OrderedDict()
         self.flatten = False
+        # Elaboratables that this fragment was elaborated from, outermost first.
+        self.origins = ()
 
     def add_ports(self, *ports, dir):
         assert dir in ("i", "o", "io")
@@ -122,7 +133,8 @@ class Fragment:
 
     def add_statements(self, *stmts):
         for stmt in Statement.cast(stmts):
-            stmt._MustUse__used = True
+            if isinstance(stmt, Property):
+                stmt._MustUse__used = True
             self.statements.append(stmt)
 
     def add_subfragment(self, subfragment, name=None):
@@ -245,7 +257,10 @@ class Fragment:
                 raise DriverConflict(message)
             elif mode == "warn":
                 message += "; hierarchy will be flattened"
-                warnings.warn_explicit(message, DriverConflict, *signal.src_loc)
+                if signal.src_loc is None:
+                    warnings.warn(message, DriverConflict)
+                else:
+                    warnings.warn_explicit(message, DriverConflict, *signal.src_loc)
 
         for memory, subfrags in memory_subfrags.items():
             subfrag_names = flatten_subfrags_if_needed(subfrags)
@@ -259,7 +274,10 @@ class Fragment:
                 raise DriverConflict(message)
             elif mode == "warn":
                 message += "; hierarchy will be flattened"
-                warnings.warn_explicit(message, DriverConflict, *memory.src_loc)
+                if memory.src_loc is None:
+                    warnings.warn(message, DriverConflict)
+                else:
+                    warnings.warn_explicit(message, DriverConflict, *memory.src_loc)
 
         # Flatten hierarchy.
         for subfrag, subfrag_hierarchy in sorted(flatten_subfrags, key=lambda x: x[1]):
@@ -523,12 +541,15 @@ class Fragment:
             else:
                 self.add_ports(sig, dir="i")
 
-    def prepare(self, ports=None, missing_domain=lambda name: ClockDomain(name)):
-        from .xfrm import SampleLowerer, DomainLowerer
+    def prepare(self, ports=None, missing_domain=lambda name: ClockDomain(name), *,
+                simplify=False):
+        from .xfrm import SampleLowerer, DomainLowerer, Simplifier
 
         fragment = SampleLowerer()(self)
         new_domains = fragment._propagate_domains(missing_domain)
         fragment = DomainLowerer()(fragment)
+        if simplify:
+            fragment = Simplifier()(fragment)
         if ports is None:
             fragment._propagate_ports(ports=(), all_undef_as_ports=True)
         else:
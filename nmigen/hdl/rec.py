@@ -85,6 +85,64 @@ class Layout:
         return "Layout([{}])".format(", ".join(field_reprs))
 
 
+def _layout_width(layout):
+    width = 0
+    for name, shape, dir in layout:
+        if isinstance(shape, Layout):
+            width += _layout_width(shape)
+        else:
+            width += Shape.cast(shape).width
+    return width
+
+
+def _storage_slice(storage, start, stop):
+    if isinstance(storage, Slice):
+        return Slice(storage.value, storage.start + start, storage.start + stop)
+    return Slice(storage, start, stop)
+
+
+def _merge_slices(first, second):
+    # Returns a value equivalent to `Cat(first, second)` if both are slices (or bitwise ORs of
+    # slices) of the same values that are adjacent, and None otherwise.
+    if type(first) is Slice and type(second) is Slice:
+        if first.value is second.value and first.stop == second.start:
+            return Slice(first.value, first.start, second.stop)
+    elif type(first) is Operator and type(second) is Operator:
+        if first.operator == second.operator == "|":
+            operands = [_merge_slices(a, b) for a, b in zip(first.operands, second.operands)]
+            if not any(operand is None for operand in operands):
+                return Operator("|", operands)
+    return None
+
+
+def _merge_assigns(stmts):
+    # Merges assignments to adjacent fields of packed records into a single wider assignment.
+    # Fields are never assigned more than once by `Record.connect`, so the assignments can be
+    # reordered freely.
+    new_stmts = []
+    last_stmts = {}
+    for stmt in stmts:
+        if type(stmt.lhs) is Slice and id(stmt.lhs.value) in last_stmts:
+            index = last_stmts[id(stmt.lhs.value)]
+            last_stmt = new_stmts[index]
+            lhs = _merge_slices(last_stmt.lhs, stmt.lhs)
+            rhs = _merge_slices(last_stmt.rhs, stmt.rhs)
+            if lhs is not None and rhs is not None:
+                new_stmts[index] = lhs.eq(rhs)
+                continue
+        if type(stmt.lhs) is Slice:
+            last_stmts[id(stmt.lhs.value)] = len(new_stmts)
+        new_stmts.append(stmt)
+
+    def unslice(value):
+        if type(value) is Slice and value.start == 0 and value.stop == len(value.value):
+            return value.value
+        if type(value) is Operator:
+            return Operator(value.operator, [unslice(operand) for operand in value.operands])
+        return value
+    return [unslice(stmt.lhs).eq(unslice(stmt.rhs)) for stmt in new_stmts]
+
+
 # Unlike most Values, Record *can* be subclassed.
 class Record(UserValue):
     @staticmethod
@@ -101,6 +159,9 @@ class Record(UserValue):
                 return b
             return "{}__{}".format(a, b)
 
+        if other._storage is not None:
+            return Record(other.layout, name=new_name, packed=True, src_loc_at=1)
+
         fields = {}
         for field_name in other.fields:
             field = other[field_name]
@@ -113,7 +174,8 @@ class Record(UserValue):
 
         return Record(other.layout, name=new_name, fields=fields, src_loc_at=1)
 
-    def __init__(self, layout, *, name=None, fields=None, src_loc_at=0):
+    def __init__(self, layout, *, name=None, fields=None, packed=False, src_loc_at=0,
+                 _storage=None):
         super().__init__(src_loc_at=src_loc_at)
 
         if name is None:
@@ -129,13 +191,38 @@ class Record(UserValue):
 
         self.layout = Layout.cast(layout, src_loc_at=1 + src_loc_at)
         self.fields = OrderedDict()
+        if packed and _storage is None:
+            if fields is not None:
+                raise ValueError("Fields of a packed record cannot be specified")
+            _storage = Signal(_layout_width(self.layout), name=name, src_loc_at=1 + src_loc_at)
+        self._storage = _storage
+        if _storage is not None:
+            # A packed record is backed by a single signal, and its fields are slices of it. As with
+            # any signal, all of its fields must be driven from the same domain of the same module.
+            offset = 0
+            for field_name, field_shape, field_dir in self.layout:
+                if isinstance(field_shape, Layout):
+                    width = _layout_width(field_shape)
+                    self.fields[field_name] = Record(field_shape, name=concat(name, field_name),
+                        src_loc_at=1 + src_loc_at,
+                        _storage=_storage_slice(_storage, offset, offset + width))
+                else:
+                    width, signed = Shape.cast(field_shape)
+                    if signed:
+                        raise TypeError("Field '{}' of a packed record cannot be signed"
+                                        .format(field_name))
+                    self.fields[field_name] = _storage_slice(_storage, offset, offset + width)
+                offset += width
+            return
+
         for field_name, field_shape, field_dir in self.layout:
             if fields is not None and field_name in fields:
                 field = fields[field_name]
                 if isinstance(field_shape, Layout):
                     assert isinstance(field, Record) and field_shape == field.layout
                 else:
-                    assert isinstance(field, Signal) and Shape.cast(field_shape) == field.shape()
+                    assert isinstance(field, (Signal, Slice)) and \
+                           Shape.cast(field_shape) == field.shape()
                 self.fields[field_name] = field
             else:
                 if isinstance(field_shape, Layout):
@@ -169,21 +256,27 @@ class Record(UserValue):
             return super().__getitem__(item)
 
     def lower(self):
+        if self._storage is not None:
+            return self._storage
         return Cat(self.fields.values())
 
     def _lhs_signals(self):
+        if self._storage is not None:
+            return self._storage._lhs_signals()
         return union((f._lhs_signals() for f in self.fields.values()), start=SignalSet())
 
     def _rhs_signals(self):
+        if self._storage is not None:
+            return self._storage._rhs_signals()
         return union((f._rhs_signals() for f in self.fields.values()), start=SignalSet())
 
     def __repr__(self):
         fields = []
         for field_name, field in self.fields.items():
-            if isinstance(field, Signal):
-                fields.append(field_name)
-            else:
+            if isinstance(field, Record):
                 fields.append(repr(field))
+            else:
+                fields.append(field_name)
         name = self.name
         if name is None:
             name = "<unnamed>"
@@ -237,4 +330,6 @@ class Record(UserValue):
                 if direction == DIR_FANIN:
                     stmts += [item.eq(reduce(lambda a, b: a | b, subord_items))]
 
+        if self._storage is not None:
+            stmts = _merge_assigns(stmts)
         return stmts
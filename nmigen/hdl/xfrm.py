@@ -5,7 +5,7 @@ from collections.abc import Iterable
 from .._utils import flatten, deprecated
 from .. import tracer
 from .ast import *
-from .ast import _StatementList
+from .ast import _StatementList, _set_src_loc
 from .cd import *
 from .ir import *
 from .rec import *
@@ -16,7 +16,7 @@ __all__ = ["ValueVisitor", "ValueTransformer",
            "FragmentTransformer",
            "TransformedElaboratable",
            "DomainCollector", "DomainRenamer", "DomainLowerer",
-           "SampleDomainInjector", "SampleLowerer",
+           "SampleDomainInjector", "SampleLowerer", "Simplifier",
            "SwitchCleaner", "LHSGroupAnalyzer", "LHSGroupFilter",
            "ResetInserter", "EnableInserter"]
 
@@ -120,7 +120,7 @@ class ValueVisitor(metaclass=ABCMeta):
         else:
             new_value = self.on_unknown_value(value)
         if isinstance(new_value, Value) and self.replace_value_src_loc(value, new_value):
-            new_value.src_loc = value.src_loc
+            _set_src_loc(new_value, value.src_loc)
         return new_value
 
     def __call__(self, value):
@@ -295,6 +295,7 @@ class FragmentTransformer:
             new_fragment = Fragment()
             new_fragment.flatten = fragment.flatten
         new_fragment.attrs = OrderedDict(fragment.attrs)
+        new_fragment.origins = fragment.origins
         self.map_ports(fragment, new_fragment)
         self.map_subfragments(fragment, new_fragment)
         self.map_domains(fragment, new_fragment)
@@ -598,6 +599,236 @@ class SampleLowerer(FragmentTransformer, ValueTransformer, StatementTransformer)
             new_fragment.add_subfragment(Instance("$initstate", o_Y=self.initial))
 
 
+def _const_mask(shape):
+    return (1 << shape.width) - 1
+
+
+def _eval_operator(operator, operands):
+    # Computes the mathematical value of an operator applied to constants, exactly as pysim does.
+    values = [operand.value for operand in operands]
+    if len(values) == 1:
+        a, = values
+        a_mask = _const_mask(operands[0].shape())
+        if operator == "~":
+            return ~a
+        if operator == "-":
+            return -a
+        if operator in ("b", "r|"):
+            return int(a != 0)
+        if operator == "r&":
+            return int(a & a_mask == a_mask)
+        if operator == "r^":
+            return format(a & a_mask, "b").count("1") % 2
+        if operator in ("u", "s"):
+            return a
+    elif len(values) == 2:
+        a, b = values
+        if operator == "+":
+            return a + b
+        if operator == "-":
+            return a - b
+        if operator == "*":
+            return a * b
+        if operator == "//":
+            return 0 if b == 0 else a // b
+        if operator == "%":
+            return 0 if b == 0 else a % b
+        if operator == "&":
+            return a & b
+        if operator == "|":
+            return a | b
+        if operator == "^":
+            return a ^ b
+        if operator == "<<" and b >= 0:
+            return a << b
+        if operator == ">>" and b >= 0:
+            return a >> b
+        if operator == "==":
+            return int(a == b)
+        if operator == "!=":
+            return int(a != b)
+        if operator == "<":
+            return int(a < b)
+        if operator == "<=":
+            return int(a <= b)
+        if operator == ">":
+            return int(a > b)
+        if operator == ">=":
+            return int(a >= b)
+    elif len(values) == 3:
+        if operator == "m":
+            s, a, b = values
+            return a if s else b
+    return None
+
+
+def _match_switch_key(key, value):
+    for bit, char in enumerate(reversed(key)):
+        if char != "-" and int(char) != (value >> bit) & 1:
+            return False
+    return True
+
+
+class Simplifier(FragmentTransformer, ValueTransformer, StatementTransformer):
+    """Fold constants and apply algebraic identities.
+
+    Every simplified value has exactly the same shape and value as the original one, so
+    the simplification is invisible to the rest of the design; it only reduces the size of
+    the IR that the backends and the simulator have to process. Values that would have to be
+    sign-extended are left alone. Switches with a constant test are replaced with the statements
+    of the case they select.
+    """
+    def _extend(self, value, shape, orig):
+        # Returns `value` with exactly `shape`, or None if that would take more than zero-extension.
+        if value.shape() == shape:
+            return value
+        if type(value) is Const:
+            return Const(value.value, shape)
+        if shape.signed or value.shape().signed or len(value) > shape.width:
+            return None
+        new_value = Cat(value, Const(0, shape.width - len(value)))
+        _set_src_loc(new_value, orig.src_loc)
+        return new_value
+
+    def _simplify_Operator(self, value):
+        shape = value.shape()
+        operands = value.operands
+        if all(type(operand) is Const for operand in operands):
+            result = _eval_operator(value.operator, operands)
+            if result is not None:
+                return Const(result, shape)
+            return value
+
+        new_value = None
+        if len(operands) == 1:
+            if value.operator in ("b", "r|", "r&", "r^", "u", "s"):
+                # These do not change the bits of an operand of the same shape as the result.
+                if operands[0].shape() == shape:
+                    new_value = operands[0]
+        elif len(operands) == 2:
+            lhs, rhs = operands
+            if type(lhs) is Const and value.operator in ("+", "*", "&", "|", "^"):
+                lhs, rhs = rhs, lhs
+            if type(rhs) is Const:
+                mask = _const_mask(shape)
+                if value.operator in ("+", "-", "|", "^", "<<", ">>") and rhs.value == 0:
+                    new_value = self._extend(lhs, shape, value)
+                elif value.operator in ("*", "&") and rhs.value == 0:
+                    new_value = Const(0, shape)
+                elif value.operator == "&" and rhs.value & mask == mask:
+                    new_value = self._extend(lhs, shape, value)
+                elif value.operator == "|" and rhs.value & mask == mask:
+                    new_value = Const(-1, shape)
+        elif len(operands) == 3:
+            if value.operator == "m":
+                sel, val1, val0 = operands
+                if type(sel) is Const:
+                    new_value = self._extend(val1 if sel.value else val0, shape, value)
+                elif val1 is val0:
+                    new_value = self._extend(val1, shape, value)
+        if new_value is None:
+            return value
+        return new_value
+
+    def _simplify_Slice(self, value):
+        inner = value.value
+        if type(inner) is Const:
+            return Const(inner.value >> value.start, unsigned(value.stop - value.start))
+        if type(inner) is Slice:
+            new_value = Slice(inner.value, inner.start + value.start, inner.start + value.stop)
+            _set_src_loc(new_value, value.src_loc)
+            return self._simplify_Slice(new_value)
+        if value.start == 0 and value.stop == len(inner) and not inner.shape().signed:
+            return inner
+        return value
+
+    def _simplify_Part(self, value):
+        if type(value.offset) is not Const:
+            return value
+        offset = value.offset.value & _const_mask(value.offset.shape())
+        start  = offset * value.stride
+        if start + value.width > len(value.value):
+            return value
+        new_value = Slice(value.value, start, start + value.width)
+        _set_src_loc(new_value, value.src_loc)
+        return self._simplify_Slice(new_value)
+
+    def _simplify_Cat(self, value):
+        parts = []
+        for part in value.parts:
+            if type(part) is Cat:
+                part_parts = part.parts
+            else:
+                part_parts = [part]
+            for part in part_parts:
+                if type(part) is Const and len(part) == 0:
+                    continue
+                if type(part) is Const and parts and type(parts[-1]) is Const:
+                    # Adjacent constants are merged into one.
+                    last = parts.pop()
+                    part = Const(last.value & _const_mask(last.shape()) |
+                                 part.value << len(last), unsigned(len(last) + len(part)))
+                parts.append(part)
+        if not parts:
+            return Const(0, 0)
+        if len(parts) == 1:
+            part, = parts
+            if type(part) is Const:
+                return Const(part.value, unsigned(len(part)))
+            if not part.shape().signed:
+                return part
+        if len(parts) == len(value.parts) and all(map(lambda a, b: a is b, parts, value.parts)):
+            return value
+        new_value = Cat(parts)
+        _set_src_loc(new_value, value.src_loc)
+        return new_value
+
+    def _simplify_Repl(self, value):
+        if value.count == 0:
+            return Const(0, 0)
+        if value.count == 1 or type(value.value) is Const:
+            new_value = Cat(value.value for _ in range(value.count))
+            _set_src_loc(new_value, value.src_loc)
+            return self._simplify_Cat(new_value)
+        return value
+
+    def _simplify_ArrayProxy(self, value):
+        if type(value.index) is not Const or not value.elems:
+            return value
+        # Out of bounds indexes select the last element, as in the backends.
+        index = value.index.value & _const_mask(value.index.shape())
+        elem = value.elems[min(index, len(value.elems) - 1)]
+        if elem.shape() == value.shape():
+            return elem
+        return value
+
+    def on_value(self, value):
+        new_value = super().on_value(value)
+        if type(new_value) is Operator:
+            return self._simplify_Operator(new_value)
+        elif type(new_value) is Slice:
+            return self._simplify_Slice(new_value)
+        elif type(new_value) is Part:
+            return self._simplify_Part(new_value)
+        elif type(new_value) is Cat:
+            return self._simplify_Cat(new_value)
+        elif type(new_value) is Repl:
+            return self._simplify_Repl(new_value)
+        elif type(new_value) is ArrayProxy:
+            return self._simplify_ArrayProxy(new_value)
+        return new_value
+
+    def on_Switch(self, stmt):
+        new_stmt = super().on_Switch(stmt)
+        if type(new_stmt.test) is not Const:
+            return new_stmt
+        test = new_stmt.test.value & _const_mask(new_stmt.test.shape())
+        for keys, stmts in new_stmt.cases.items():
+            if not keys or any(_match_switch_key(key, test) for key in keys):
+                return stmts
+        return _StatementList()
+
+
 class SwitchCleaner(StatementVisitor):
     def on_ignore(self, stmt):
         return stmt
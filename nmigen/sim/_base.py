@@ -53,6 +53,9 @@ class BaseEngine:
     def add_clock_process(self, clock, *, phase, period):
         raise NotImplementedError
 
+    def add_cxxrtl_fragment(self, fragment, *, hierarchy):
+        raise NotImplementedError
+
     def reset(self):
         raise NotImplementedError
 
@@ -60,8 +63,34 @@ class BaseEngine:
     def now(self):
         raise NotImplementedError
 
+    @property
+    def delta_cycles(self):
+        raise NotImplementedError
+
+    def clock_cycles(self, clock):
+        raise NotImplementedError
+
     def advance(self):
         raise NotImplementedError
 
-    def write_vcd(self, *, vcd_file, gtkw_file, traces):
+    def write_vcd(self, *, vcd_file, gtkw_file, traces,
+                  include=None, exclude=None, depth=None, signals=None, background=False,
+                  compression=None):
+        raise NotImplementedError
+
+    def write_columnar(self, *, file, traces, include=None, exclude=None, depth=None,
+                       signals=None, block_size):
+        raise NotImplementedError
+
+    def capture_vcd(self, *, vcd_file, gtkw_file, traces, include=None, exclude=None,
+                    depth=None, signals=None, before, after, size, trigger):
+        raise NotImplementedError
+
+    def record(self, *, signals, domain):
+        raise NotImplementedError
+
+    def coverage(self):
+        raise NotImplementedError
+
+    def profile(self):
         raise NotImplementedError
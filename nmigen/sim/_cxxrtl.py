@@ -0,0 +1,220 @@
+import os
+import re
+import zlib
+import ctypes
+
+from .._toolchain.yosys import find_yosys
+from .._toolchain.cxx import build_cxx
+from ..back import cxxrtl
+
+
+__all__ = ["CxxrtlLibrary"]
+
+
+def _split_cxxrtl_source(cxx_source, units):
+    """Split the output of ``write_cxxrtl -noflatten`` into (up to) ``units`` translation units.
+
+    Every module is assigned to a unit by a hash of its name, so that the assignment does not
+    depend on the rest of the design. Every unit includes the definitions of the modules assigned
+    to it and of every module they instantiate, so changing a module only changes the units of
+    that module and the modules that instantiate it.
+    """
+    begin_match = re.search(r"^namespace cxxrtl_design \{\n", cxx_source, re.M)
+    end_match   = re.search(r"^\} // namespace cxxrtl_design\n", cxx_source, re.M)
+    if units == 1 or begin_match is None or end_match is None:
+        return {"design.cc": cxx_source}
+    header = cxx_source[:begin_match.end()]
+    body   = cxx_source[begin_match.end():end_match.start()]
+    footer = cxx_source[end_match.start():]
+
+    modules = {}
+    struct_re = re.compile(r"^(?://[^\n]*\n)*struct (p_\w+) : public module \{\n"
+                           r".*?^\}; // struct \1\n", re.M | re.S)
+    struct_matches = list(struct_re.finditer(body))
+    if not struct_matches or body[:struct_matches[0].start()].strip():
+        return {"design.cc": cxx_source}
+    for index, struct_match in enumerate(struct_matches):
+        if index + 1 < len(struct_matches):
+            methods_end = struct_matches[index + 1].start()
+        else:
+            methods_end = len(body)
+        struct = struct_match.group(0)
+        modules[struct_match.group(1)] = (
+            struct,
+            body[struct_match.end():methods_end],
+            re.findall(r"^\t(p_\w+) cell_\w+;$", struct, re.M),
+        )
+
+    def add_struct(unit_structs, name):
+        struct, methods, cells = modules[name]
+        for cell in cells:
+            if cell in modules:
+                add_struct(unit_structs, cell)
+        if name not in unit_structs:
+            unit_structs.append(name)
+
+    def unit_of(name):
+        return zlib.crc32(name.encode("utf-8")) % units
+
+    unit_modules = [[] for _ in range(units)]
+    for name in modules:
+        unit_modules[unit_of(name)].append(name)
+    # The footer instantiates the toplevel module.
+    toplevel_match = re.search(r"new cxxrtl_design::(p_\w+)\b", footer)
+    if toplevel_match is None or toplevel_match.group(1) not in modules:
+        return {"design.cc": cxx_source}
+    footer_unit = unit_of(toplevel_match.group(1))
+
+    cxx_sources = {}
+    for unit, names in enumerate(unit_modules):
+        if not names:
+            continue
+        unit_structs = []
+        for name in names:
+            add_struct(unit_structs, name)
+        unit_source = [header]
+        unit_source += (modules[name][0] for name in unit_structs)
+        unit_source += (modules[name][1] for name in names)
+        if unit == footer_unit:
+            unit_source.append(footer)
+        else:
+            unit_source.append("} // namespace cxxrtl_design\n")
+        cxx_sources["design_{}.cc".format(unit)] = "".join(unit_source)
+    return cxx_sources
+
+
+class _cxxrtl_object(ctypes.Structure):
+    # Mirrors `struct cxxrtl_object` from `backends/cxxrtl/cxxrtl_capi.h`.
+    _fields_ = [
+        ("type",    ctypes.c_uint32),
+        ("flags",   ctypes.c_uint32),
+        ("width",   ctypes.c_size_t),
+        ("lsb_at",  ctypes.c_size_t),
+        ("depth",   ctypes.c_size_t),
+        ("zero_at", ctypes.c_size_t),
+        ("curr",    ctypes.POINTER(ctypes.c_uint32)),
+        ("next",    ctypes.POINTER(ctypes.c_uint32)),
+    ]
+
+
+class _CxxrtlValue:
+    """A view of the storage of a single (non-memory) CXXRTL object.
+
+    The value is read from the ``curr`` buffer and written to the ``next`` buffer of the object,
+    as required by the CXXRTL C API.
+    """
+    __slots__ = ("width", "signed", "chunks", "curr", "next")
+
+    def __init__(self, obj, *, signed):
+        self.width  = obj.width
+        self.signed = signed
+        self.chunks = (obj.width + 31) // 32
+        array_type  = ctypes.POINTER(ctypes.c_uint32 * self.chunks)
+        self.curr   = ctypes.cast(obj.curr, array_type).contents
+        if obj.next:
+            self.next = ctypes.cast(obj.next, array_type).contents
+        else:
+            self.next = None
+
+    def get(self):
+        if self.chunks == 1:
+            value = self.curr[0]
+        else:
+            value = 0
+            for index in range(self.chunks):
+                value |= self.curr[index] << (index * 32)
+        if self.signed and value & (1 << (self.width - 1)):
+            value -= 1 << self.width
+        return value
+
+    def set(self, value):
+        value &= (1 << self.width) - 1
+        if self.chunks == 1:
+            self.next[0] = value
+        else:
+            for index in range(self.chunks):
+                self.next[index] = (value >> (index * 32)) & 0xffffffff
+
+
+class CxxrtlLibrary:
+    """A fragment translated to C++ with CXXRTL, compiled, and loaded with :mod:`ctypes`.
+
+    The fragment must already be prepared; its ports become the ports of the compiled design.
+    Use ``opt_level="g"`` to keep every named signal observable.
+
+    If ``units`` is greater than 1, the hierarchy of the design is preserved, and the generated
+    code is split into that many translation units, which are compiled in parallel and cached
+    separately. This reduces the time it takes to (re)build large designs, but may make
+    the simulation slower. By default, the ``NMIGEN_cxxrtl_units`` environment variable is used.
+    """
+    def __init__(self, fragment, *, name="top", opt_level=None, units=None):
+        if units is None:
+            units = int(os.getenv("NMIGEN_cxxrtl_units", "1"))
+        if not isinstance(units, int) or units < 1:
+            raise ValueError("Number of translation units must be a positive integer, not {!r}"
+                             .format(units))
+
+        cxx_source, self.name_map = \
+            cxxrtl.convert_fragment(fragment, name=name, opt_level=opt_level, flatten=units == 1)
+
+        yosys = find_yosys(lambda ver: ver >= (0, 9, 3468))
+        self._build_dir, so_filename = build_cxx(
+            cxx_sources={
+                **_split_cxxrtl_source(cxx_source, units),
+                "cxxrtl_capi.cc": "#include <backends/cxxrtl/cxxrtl_capi.cc>\n",
+            },
+            output_name=name,
+            include_dirs=[os.path.join(str(yosys.data_dir()), "include")],
+            macros=[],
+        )
+        self._library = library = \
+            ctypes.cdll.LoadLibrary(os.path.join(self._build_dir.name, so_filename))
+
+        library.cxxrtl_design_create.argtypes = []
+        library.cxxrtl_design_create.restype  = ctypes.c_void_p
+        library.cxxrtl_create.argtypes = [ctypes.c_void_p]
+        library.cxxrtl_create.restype  = ctypes.c_void_p
+        library.cxxrtl_destroy.argtypes = [ctypes.c_void_p]
+        library.cxxrtl_destroy.restype  = None
+        library.cxxrtl_reset.argtypes = [ctypes.c_void_p]
+        library.cxxrtl_reset.restype  = None
+        library.cxxrtl_eval.argtypes = [ctypes.c_void_p]
+        library.cxxrtl_eval.restype  = ctypes.c_int
+        library.cxxrtl_commit.argtypes = [ctypes.c_void_p]
+        library.cxxrtl_commit.restype  = ctypes.c_int
+        library.cxxrtl_get_parts.argtypes = \
+            [ctypes.c_void_p, ctypes.c_char_p, ctypes.POINTER(ctypes.c_size_t)]
+        library.cxxrtl_get_parts.restype  = ctypes.POINTER(_cxxrtl_object)
+
+        self._handle = library.cxxrtl_create(library.cxxrtl_design_create())
+
+    def reset(self):
+        self._library.cxxrtl_reset(self._handle)
+
+    def step(self):
+        # Unlike `cxxrtl_step()`, which stops as soon as `eval()` converges, keep evaluating
+        # the design until nothing changes on commit, so that combinatorial logic driven by
+        # storage cells is updated after a clock edge, too.
+        library, handle = self._library, self._handle
+        library.cxxrtl_eval(handle)
+        while library.cxxrtl_commit(handle):
+            library.cxxrtl_eval(handle)
+
+    def __del__(self):
+        if getattr(self, "_handle", None) is not None:
+            self._library.cxxrtl_destroy(self._handle)
+            self._handle = None
+
+    def get(self, signal):
+        """Get a view of the value of ``signal``, or ``None`` if it is not a part of the design.
+
+        Signals that are split into several parts in the compiled design are not supported.
+        """
+        if signal not in self.name_map:
+            return None
+        debug_name = " ".join(self.name_map[signal][1:]).encode("utf-8")
+        parts = ctypes.c_size_t()
+        obj = self._library.cxxrtl_get_parts(self._handle, debug_name, ctypes.byref(parts))
+        if not obj or parts.value != 1:
+            return None
+        return _CxxrtlValue(obj.contents, signed=signal.shape().signed)
@@ -14,6 +14,7 @@ class PyClockProcess(BaseProcess):
         self.slot   = self.state.get_signal(signal)
         self.phase  = phase
         self.period = period
+        self.name   = "<clock {}>".format(signal.name)
 
         self.reset()
 
@@ -22,6 +23,7 @@ class PyClockProcess(BaseProcess):
         self.passive = True
 
         self.initial = True
+        self.cycles  = 0
 
     def run(self):
         self.runnable = False
@@ -32,5 +34,7 @@ class PyClockProcess(BaseProcess):
 
         else:
             clk_state = self.state.slots[self.slot]
+            if not clk_state.curr:
+                self.cycles += 1
             clk_state.set(not clk_state.curr)
             self.state.wait_interval(self, self.period / 2)
@@ -16,6 +16,7 @@ class PyCoroProcess(BaseProcess):
         self.domains = domains
         self.constructor = constructor
         self.default_cmd = default_cmd
+        self.name = getattr(constructor, "__qualname__", repr(constructor))
 
         self.reset()
 
@@ -0,0 +1,75 @@
+from ..hdl.ast import SignalSet
+from ._base import BaseProcess
+from ._cxxrtl import CxxrtlLibrary
+
+
+__all__ = ["PyCxxrtlProcess"]
+
+
+class PyCxxrtlProcess(BaseProcess):
+    """A fragment compiled with CXXRTL, stepped as a single process.
+
+    The process is woken up whenever any of the inputs of the fragment changes. It then copies
+    the inputs into the compiled design, steps it until it converges, and queues any changes to
+    the outputs of the fragment, exactly like a process compiled from HDL would.
+    """
+    def __init__(self, state, fragment, *, hierarchy=("top",), opt_level=None):
+        self.state   = state
+        self.name    = (hierarchy, "cxxrtl")
+        self.library = CxxrtlLibrary(fragment, name=hierarchy[-1], opt_level=opt_level)
+
+        self.inputs  = []
+        self.outputs = []
+        for signal, direction in fragment.ports.items():
+            if direction == "io":
+                raise NotImplementedError("Cannot simulate inout port {!r} with CXXRTL"
+                                          .format(signal))
+            value = self.library.get(signal)
+            if value is None:
+                raise NotImplementedError("Cannot simulate port {!r} with CXXRTL because it is "
+                                          "not a single object in the compiled design"
+                                          .format(signal))
+            if direction == "i" and value.next is None:
+                raise NotImplementedError("Cannot simulate input port {!r} with CXXRTL because "
+                                          "it cannot be written in the compiled design"
+                                          .format(signal))
+            signal_index = self.state.get_signal(signal)
+            if direction == "i":
+                self.inputs.append((self.state.slots[signal_index], value))
+                self.state.add_trigger(self, signal)
+            else:
+                self.outputs.append((self.state.slots[signal_index], value))
+        self.input_signals = SignalSet(signal_state.signal for signal_state, _ in self.inputs)
+
+        self.reset()
+
+    def add_output(self, signal_state):
+        """Update ``signal_state`` whenever the corresponding signal of the design changes.
+
+        Returns ``True`` if the signal is driven by the design, and ``False`` otherwise.
+        """
+        if signal_state.signal in self.input_signals:
+            return False
+        value = self.library.get(signal_state.signal)
+        if value is None:
+            return False
+        if self.settled:
+            # Otherwise, the value is updated the next time the process runs, like any other.
+            signal_state.curr = signal_state.next = value.get()
+        self.outputs.append((signal_state, value))
+        return True
+
+    def reset(self):
+        self.runnable = True
+        self.passive  = True
+
+        self.library.reset()
+        self.settled = False
+
+    def run(self):
+        for signal_state, value in self.inputs:
+            value.set(signal_state.curr)
+        self.library.step()
+        for signal_state, value in self.outputs:
+            signal_state.set(value.get())
+        self.settled = True
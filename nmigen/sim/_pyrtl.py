@@ -8,14 +8,15 @@ from ..hdl.xfrm import ValueVisitor, StatementVisitor, LHSGroupFilter
 from ._base import BaseProcess
 
 
-__all__ = ["PyRTLProcess"]
+__all__ = ["PyRTLProcess", "PyRTLCoverage"]
 
 
 class PyRTLProcess(BaseProcess):
-    __slots__ = ("is_comb", "runnable", "passive", "run")
+    __slots__ = ("is_comb", "runnable", "passive", "run", "name")
 
-    def __init__(self, *, is_comb):
+    def __init__(self, *, is_comb, name=None):
         self.is_comb  = is_comb
+        self.name     = name
 
         self.reset()
 
@@ -24,6 +25,23 @@ class PyRTLProcess(BaseProcess):
         self.passive  = True
 
 
+class PyRTLCoverage:
+    """Branch coverage counters of the processes compiled from HDL.
+
+    The counters are incremented by the generated code directly, and are stored in a list that
+    is allocated while the design is compiled.
+    """
+    def __init__(self):
+        self.case_hits = []
+        self.cases     = []
+
+    def add_case(self, hierarchy, switch, patterns):
+        self.cases.append((hierarchy, switch.src_loc, patterns,
+                           switch.case_src_locs.get(patterns)))
+        self.case_hits.append(0)
+        return len(self.case_hits) - 1
+
+
 class _PythonEmitter:
     def __init__(self):
         self._buffer = []
@@ -213,6 +231,14 @@ class _RHSValueCompiler(_ValueCompiler):
         return f"0"
 
     def on_ArrayProxy(self, value):
+        part = value._as_part()
+        # Packing elements that are not constants would take longer than comparing the index
+        # with every element, but a table of constants is a single shift and mask.
+        if part is not None and type(part.value) is Const:
+            if value.shape().signed:
+                return f"sign({self(part)}, {-1 << (len(value) - 1)})"
+            else:
+                return self(part)
         index_mask = (1 << len(value.index)) - 1
         gen_index = self.emitter.def_var("rhs_index", f"{index_mask} & {self(value.index)}")
         gen_value = self.emitter.gen_var("rhs_proxy")
@@ -325,10 +351,14 @@ class _LHSValueCompiler(_ValueCompiler):
 
 
 class _StatementCompiler(StatementVisitor, _Compiler):
-    def __init__(self, state, emitter, *, inputs=None, outputs=None):
+    def __init__(self, state, emitter, *, inputs=None, outputs=None, coverage=None,
+                 hierarchy=None):
         super().__init__(state, emitter)
         self.rhs = _RHSValueCompiler(state, emitter, mode="curr", inputs=inputs)
         self.lhs = _LHSValueCompiler(state, emitter, rhs=self.rhs, outputs=outputs)
+        # If not None, `coverage` gets a counter for every case of every switch.
+        self.coverage  = coverage
+        self.hierarchy = hierarchy
 
     def on_statements(self, stmts):
         for stmt in stmts:
@@ -360,6 +390,9 @@ class _StatementCompiler(StatementVisitor, _Compiler):
             else:
                 self.emitter.append(f"elif {' or '.join(gen_checks)}:")
             with self.emitter.indent():
+                if self.coverage is not None:
+                    case_index = self.coverage.add_case(self.hierarchy, stmt, patterns)
+                    self.emitter.append(f"case_hits[{case_index}] += 1")
                 self(stmts)
 
     def on_Assert(self, stmt):
@@ -385,15 +418,17 @@ class _StatementCompiler(StatementVisitor, _Compiler):
 
 
 class _FragmentCompiler:
-    def __init__(self, state):
+    def __init__(self, state, *, coverage=None):
         self.state = state
+        self.coverage = coverage
 
-    def __call__(self, fragment):
+    def __call__(self, fragment, *, hierarchy=("top",)):
         processes = set()
 
         for domain_name, domain_signals in fragment.drivers.items():
             domain_stmts = LHSGroupFilter(domain_signals)(fragment.statements)
-            domain_process = PyRTLProcess(is_comb=domain_name is None)
+            domain_process = PyRTLProcess(is_comb=domain_name is None,
+                                          name=(hierarchy, domain_name or "comb"))
 
             emitter = _PythonEmitter()
             emitter.append(f"def run():")
@@ -405,7 +440,8 @@ class _FragmentCompiler:
                     emitter.append(f"next_{signal_index} = {signal.reset}")
 
                 inputs = SignalSet()
-                _StatementCompiler(self.state, emitter, inputs=inputs)(domain_stmts)
+                _StatementCompiler(self.state, emitter, inputs=inputs,
+                                   coverage=self.coverage, hierarchy=hierarchy)(domain_stmts)
 
                 for input in inputs:
                     self.state.add_trigger(domain_process, input)
@@ -422,7 +458,8 @@ class _FragmentCompiler:
                     signal_index = self.state.get_signal(signal)
                     emitter.append(f"next_{signal_index} = slots[{signal_index}].next")
 
-                _StatementCompiler(self.state, emitter)(domain_stmts)
+                _StatementCompiler(self.state, emitter,
+                                   coverage=self.coverage, hierarchy=hierarchy)(domain_stmts)
 
             for signal in domain_signals:
                 signal_index = self.state.get_signal(signal)
@@ -440,6 +477,8 @@ class _FragmentCompiler:
                 filename = "<string>"
 
             exec_locals = {"slots": self.state.slots, **_ValueCompiler.helpers}
+            if self.coverage is not None:
+                exec_locals["case_hits"] = self.coverage.case_hits
             exec(compile(code, filename, "exec"), exec_locals)
             domain_process.run = exec_locals["run"]
 
@@ -448,6 +487,6 @@ class _FragmentCompiler:
         for subfragment_index, (subfragment, subfragment_name) in enumerate(fragment.subfragments):
             if subfragment_name is None:
                 subfragment_name = "U${}".format(subfragment_index)
-            processes.update(self(subfragment))
+            processes.update(self(subfragment, hierarchy=(*hierarchy, subfragment_name)))
 
         return processes
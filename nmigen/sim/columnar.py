@@ -0,0 +1,234 @@
+"""Compact columnar waveform format.
+
+Waveforms written by :meth:`Simulator.write_columnar` are stored in a binary format that is
+much faster to write and much smaller than a Value Change Dump file. The format is as follows.
+
+The file starts with the 8-byte magic string ``b"nmCOL\\x00\\x00\\x01"``, followed by a sequence of
+chunks. Every chunk starts with a 1-byte type and a 4-byte little-endian payload length, followed
+by the payload. All integers are little-endian. The chunks are:
+
+``H`` (header)
+    A zlib-compressed UTF-8 JSON object with the keys ``"timescale"`` (the duration of
+    a timestamp unit, in seconds) and ``"signals"`` (a list of signals). Every signal is
+    an object with the keys ``"names"`` (a list of dot-separated hierarchical names),
+    ``"width"``, ``"signed"``, ``"reset"``, and ``"trace"`` (whether the signal was requested
+    to be displayed). Signals are referred to by their index in this list. There is exactly
+    one header chunk, and it precedes every other chunk.
+``B`` (block)
+    A zlib-compressed sequence of columns, each containing every change of a single signal
+    within the block. A column starts with the 4-byte signal index and the 4-byte change count
+    ``n``, followed by ``n`` 8-byte timestamp deltas, followed by ``n`` value deltas.
+    Each value delta is ``ceil(width / 8)`` bytes long, or 8 bytes long if the signal is
+    at most 64 bits wide. Timestamp deltas are relative to the previous change of the same signal
+    (or to 0). Value deltas are the exclusive OR of the value and the previous value of the same
+    signal (or its reset value). Values are stored in two's complement, truncated to the width
+    of the signal.
+``E`` (end)
+    The 8-byte timestamp at which the waveform ends. It is the last chunk.
+"""
+
+import sys
+import json
+import zlib
+import struct
+from array import array
+
+
+__all__ = ["ColumnarWriter", "read_columnar"]
+
+
+_MAGIC = b"nmCOL\x00\x00\x01"
+
+
+def _array_to_bytes(items):
+    if sys.byteorder != "little":
+        items.byteswap()
+    return items.tobytes()
+
+
+def _array_from_bytes(data):
+    items = array("Q")
+    items.frombytes(data)
+    if sys.byteorder != "little":
+        items.byteswap()
+    return items
+
+
+def _value_width(width):
+    if width <= 64:
+        return 8
+    return (width + 7) // 8
+
+
+class ColumnarWriter:
+    """Writer for the columnar waveform format.
+
+    Signals are added with :meth:`add_signal` before any changes are recorded. Changes are
+    buffered in memory, and every ``block_size`` changes are compressed and written as a block.
+    """
+    def __init__(self, file, *, timescale=1e-10, block_size=65536):
+        if isinstance(file, str):
+            file = open(file, "wb")
+        self.file = file
+        self.timescale  = timescale
+        self.block_size = block_size
+
+        self._signals = []
+        self._times   = []
+        self._values  = []
+        self._last_times  = []
+        self._last_values = []
+        self._count   = 0
+        self._started = False
+
+    def add_signal(self, names, *, width, signed=False, reset=0, trace=False):
+        """Add a signal, and return its index."""
+        assert not self._started
+        self._signals.append({
+            "names":  [".".join(name) for name in names],
+            "width":  width,
+            "signed": signed,
+            "reset":  reset,
+            "trace":  trace,
+        })
+        self._times.append([])
+        self._values.append([])
+        self._last_times.append(0)
+        self._last_values.append(reset & ((1 << width) - 1))
+        return len(self._signals) - 1
+
+    def _write_chunk(self, chunk_type, payload):
+        self.file.write(chunk_type + struct.pack("<I", len(payload)) + payload)
+
+    def _start(self):
+        self._started = True
+        self.file.write(_MAGIC)
+        self._write_chunk(b"H", zlib.compress(json.dumps({
+            "timescale": self.timescale,
+            "signals":   self._signals,
+        }).encode("utf-8")))
+
+    def change(self, timestamp, index, value):
+        """Record a change of the signal ``index`` to ``value`` at ``timestamp`` seconds."""
+        self._times[index].append(timestamp)
+        self._values[index].append(value)
+        self._count += 1
+        if self._count >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered changes as a block."""
+        if not self._started:
+            self._start()
+        if self._count == 0:
+            return
+
+        columns = []
+        for index, times in enumerate(self._times):
+            if not times:
+                continue
+            values = self._values[index]
+            width  = self._signals[index]["width"]
+            mask   = (1 << width) - 1
+
+            time_deltas = array("Q", [0] * len(times))
+            last_time = self._last_times[index]
+            for change_index, time in enumerate(times):
+                time = round(time / self.timescale)
+                time_deltas[change_index] = time - last_time
+                last_time = time
+            self._last_times[index] = last_time
+
+            value_deltas = []
+            last_value = self._last_values[index]
+            for value in values:
+                value &= mask
+                value_deltas.append(value ^ last_value)
+                last_value = value
+            self._last_values[index] = last_value
+
+            columns.append(struct.pack("<II", index, len(times)))
+            columns.append(_array_to_bytes(time_deltas))
+            if width <= 64:
+                columns.append(_array_to_bytes(array("Q", value_deltas)))
+            else:
+                value_width = _value_width(width)
+                columns.append(b"".join(value_delta.to_bytes(value_width, "little")
+                                        for value_delta in value_deltas))
+            times.clear()
+            values.clear()
+
+        self._write_chunk(b"B", zlib.compress(b"".join(columns)))
+        self._count = 0
+
+    def close(self, timestamp):
+        """Write the remaining changes and the end of the waveform at ``timestamp`` seconds,
+        and close the file."""
+        self.flush()
+        self._write_chunk(b"E", struct.pack("<Q", round(timestamp / self.timescale)))
+        self.file.close()
+
+
+def read_columnar(file):
+    """Read a waveform in the columnar format.
+
+    Returns a dict mapping every hierarchical name of every signal (such as ``"top.uart.tx"``)
+    to a tuple of two lists: the times (in seconds) and the values of the signal, starting with
+    its reset value at time 0. Values of signed signals are negative where applicable.
+    """
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            data = f.read()
+    else:
+        data = file.read()
+
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError("Not a columnar waveform file")
+
+    offset  = len(_MAGIC)
+    header  = None
+    columns = None
+    while offset < len(data):
+        chunk_type = data[offset:offset + 1]
+        length, = struct.unpack_from("<I", data, offset + 1)
+        payload = data[offset + 5:offset + 5 + length]
+        offset += 5 + length
+
+        if chunk_type == b"H":
+            header  = json.loads(zlib.decompress(payload).decode("utf-8"))
+            columns = [([0], [signal["reset"] & ((1 << signal["width"]) - 1)])
+                       for signal in header["signals"]]
+        elif chunk_type == b"B":
+            block = zlib.decompress(payload)
+            block_offset = 0
+            while block_offset < len(block):
+                index, count = struct.unpack_from("<II", block, block_offset)
+                block_offset += 8
+                times, values = columns[index]
+
+                time_deltas = _array_from_bytes(block[block_offset:block_offset + count * 8])
+                block_offset += count * 8
+                for time_delta in time_deltas:
+                    times.append(times[-1] + time_delta)
+
+                value_width = _value_width(header["signals"][index]["width"])
+                for change_index in range(count):
+                    value_delta = int.from_bytes(
+                        block[block_offset:block_offset + value_width], "little")
+                    values.append(values[-1] ^ value_delta)
+                    block_offset += value_width
+        elif chunk_type == b"E":
+            break
+        else:
+            raise ValueError("Unknown chunk type {!r}".format(chunk_type))
+
+    waveform = {}
+    for signal, (times, values) in zip(header["signals"], columns):
+        timescale = header["timescale"]
+        width = signal["width"]
+        if signal["signed"] and width > 0:
+            values = [value - (1 << width) if value & (1 << (width - 1)) else value
+                      for value in values]
+        for name in signal["names"]:
+            waveform[name] = ([time * timescale for time in times], values)
+    return waveform
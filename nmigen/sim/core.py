@@ -1,6 +1,10 @@
+import copy
 import inspect
+import functools
+import time
 
 from .._utils import deprecated
+from ..hdl.ast import Signal
 from ..hdl.cd import *
 from ..hdl.ir import *
 from ._base import BaseEngine
@@ -51,21 +55,189 @@ class Active(Command):
         return "(active)"
 
 
+class _SimulationCounters:
+    """Simulation throughput counters.
+
+    Attributes
+    ----------
+    now : float
+        Simulated time, in seconds.
+    delta_cycles : int
+        Number of delta cycles executed since the simulation was (re)started.
+    cycles : dict of str to int
+        Number of clock cycles executed, for every domain driven by :meth:`Simulator.add_clock`.
+    wall_time : float
+        Wall time spent advancing the simulation, in seconds.
+    cycle_rate : dict of str to float
+        Number of clock cycles executed per second of wall time, for every domain in ``cycles``.
+    """
+    def __init__(self, *, now, delta_cycles, cycles, wall_time):
+        self.now          = now
+        self.delta_cycles = delta_cycles
+        self.cycles       = cycles
+        self.wall_time    = wall_time
+        self.cycle_rate   = {domain: count / wall_time if wall_time else 0.0
+                             for domain, count in cycles.items()}
+
+    def __repr__(self):
+        return "<counters now={}s delta_cycles={} cycles={} wall_time={:.3f}s>" \
+               .format(self.now, self.delta_cycles, self.cycles, self.wall_time)
+
+
+class _ProgressCallback:
+    def __init__(self, callback, *, cycles, domain, interval):
+        self.callback = callback
+        self.cycles   = cycles
+        self.domain   = domain
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.deadline = self.cycles if self.cycles is not None else self.interval
+
+
+def _find_model(models, fragment):
+    candidates = (fragment, *fragment.origins)
+    # Models keyed by a specific elaboratable take precedence over models keyed by a class.
+    for key, model in models.items():
+        if not isinstance(key, type):
+            for candidate in candidates:
+                if candidate is key:
+                    return candidate, model
+    for key, model in models.items():
+        if isinstance(key, type):
+            for candidate in candidates:
+                if isinstance(candidate, key):
+                    return candidate, model
+    return None, None
+
+
+def _detach_subfragments(fragment, mapping, *, hierarchy=("top",)):
+    subfragments = []
+    detached = []
+    for index, (subfragment, name) in enumerate(fragment.subfragments):
+        if name is None:
+            name = "U${}".format(index)
+        elaboratable, value = _find_model(mapping, subfragment)
+        if value is None:
+            subfragment, subfragment_detached = \
+                _detach_subfragments(subfragment, mapping, hierarchy=(*hierarchy, name))
+            subfragments.append((subfragment, fragment.subfragments[index][1]))
+            detached += subfragment_detached
+            continue
+        # Keep the clock domains defined by the detached subfragment, since the rest of the design
+        # may still refer to them.
+        stub = Fragment()
+        stub.add_domains(subfragment.domains.values())
+        stub.origins = subfragment.origins
+        subfragments.append((stub, name))
+        detached.append((subfragment, elaboratable, value, (*hierarchy, name)))
+    if detached:
+        # The fragment may have been passed in by the caller, who could simulate or convert it
+        # again, so replace the subfragments in a copy instead.
+        fragment = copy.copy(fragment)
+        fragment.subfragments = subfragments
+    return fragment, detached
+
+
 class Simulator:
-    def __init__(self, fragment, *, engine="pysim"):
+    """Simulator.
+
+    Arguments
+    ---------
+    fragment : Elaboratable
+        Design to simulate.
+    engine : str or BaseEngine subclass
+        Simulation engine. Defaults to ``"pysim"``, which simulates the design in Python;
+        ``"cxxsim"`` compiles the design with CXXRTL and simulates it natively, which requires
+        Yosys and a C++ compiler.
+    models : None or dict
+        Behavioral models to simulate instead of some of the submodules of the design. Every key
+        is either an elaboratable (or an :class:`Instance`), or a class, in which case every
+        instance of that class is replaced; every value is a generator function that is called
+        with the replaced elaboratable as its only argument, and added to the simulation as if
+        with :meth:`add_process`. The model drives the ports of the replaced submodule directly,
+        and is passive, like the HDL it replaces.
+    cxxrtl : None or iterable
+        Submodules of the design to translate to C++ with CXXRTL, compile, and simulate natively
+        while the rest of the design and all processes are simulated by the engine. Every item is
+        either an elaboratable or a class, like the keys of ``models``. Only the ports of a compiled
+        submodule and the signals driven by the submodule itself (but not by its own submodules)
+        are observable by the rest of the simulation. Requires Yosys and a C++ compiler.
+    coverage : bool or str or iterable of str
+        Kind or kinds of coverage of the design to collect: ``"branch"``, ``"toggle"``, or both if
+        ``True``; see :meth:`coverage`. Branch coverage has a small overhead, while toggle coverage
+        makes every signal change slower. Supported only by the ``"pysim"`` engine.
+    """
+    def __init__(self, fragment, *, engine="pysim", models=None, cxxrtl=None, coverage=False):
         if isinstance(engine, type) and issubclass(engine, BaseEngine):
             pass
         elif engine == "pysim":
             from .pysim import PySimEngine
             engine = PySimEngine
+        elif engine == "cxxsim":
+            from .cxxsim import CxxSimEngine
+            engine = CxxSimEngine
         else:
             raise TypeError("Value '{!r}' is not a simulation engine class or "
                             "a simulation engine name"
                             .format(engine))
 
-        self._fragment = Fragment.get(fragment, platform=None).prepare()
-        self._engine   = engine(self._fragment)
+        if coverage is True:
+            coverage = ("branch", "toggle")
+        elif coverage is False:
+            coverage = ()
+        elif isinstance(coverage, str):
+            coverage = (coverage,)
+        coverage = frozenset(coverage)
+        for kind in coverage:
+            if kind not in ("branch", "toggle"):
+                raise ValueError("Coverage kind must be one of 'branch' or 'toggle', not {!r}"
+                                 .format(kind))
+
+        fragment = Fragment.get(fragment, platform=None)
+        if models is not None:
+            fragment, replaced = _detach_subfragments(fragment, models)
+        else:
+            replaced = []
+
+        self._fragment = fragment.prepare()
+        if cxxrtl is not None:
+            # Subfragments are detached only after preparing the design, since the ports of
+            # a subfragment are known only then.
+            self._fragment, compiled = \
+                _detach_subfragments(self._fragment, dict.fromkeys(cxxrtl, True))
+        else:
+            compiled = []
+
+        if coverage:
+            self._engine = engine(self._fragment, coverage=coverage)
+        else:
+            # Engines that do not collect coverage do not have to accept the argument.
+            self._engine = engine(self._fragment)
         self._clocked  = set()
+        self._progress = []
+        self._wall_time = 0.0
+
+        for subfragment, elaboratable, model, hierarchy in replaced:
+            self._add_model(elaboratable, model)
+        for subfragment, elaboratable, _, hierarchy in compiled:
+            # Make the signals driven by the compiled elaboratable itself observable, too.
+            for domain, signal in subfragment.iter_drivers():
+                if signal not in subfragment.ports:
+                    subfragment.add_ports(signal, dir="o")
+            self._engine.add_cxxrtl_fragment(subfragment, hierarchy=hierarchy)
+
+    def _add_model(self, elaboratable, model):
+        if not (inspect.isgeneratorfunction(model) or inspect.iscoroutinefunction(model)):
+            raise TypeError("Cannot use {!r} as a model because it is not a generator function"
+                            .format(model))
+        @functools.wraps(model)
+        def process():
+            # Like the HDL it replaces, a model should not keep the simulation running.
+            yield Passive()
+            yield from model(elaboratable)
+        self.add_process(process)
 
     def _check_process(self, process):
         if not (inspect.isgeneratorfunction(process) or inspect.iscoroutinefunction(process)):
@@ -75,6 +247,7 @@ class Simulator:
 
     def add_process(self, process):
         process = self._check_process(process)
+        @functools.wraps(process)
         def wrapper():
             # Only start a bench process after comb settling, so that the reset values are correct.
             yield Settle()
@@ -83,6 +256,7 @@ class Simulator:
 
     def add_sync_process(self, process, *, domain="sync"):
         process = self._check_process(process)
+        @functools.wraps(process)
         def wrapper():
             # Only start a sync process after the first clock edge (or reset edge, if the domain
             # uses an asynchronous reset). This matches the behavior of synchronous FFs.
@@ -136,8 +310,12 @@ class Simulator:
         """Reset the simulation.
 
         Assign the reset value to every signal in the simulation, and restart every user process.
+        Also resets the simulation counters.
         """
         self._engine.reset()
+        self._wall_time = 0.0
+        for progress in self._progress:
+            progress.reset()
 
     # TODO(nmigen-0.4): replace with _real_step
     @deprecated("instead of `sim.step()`, use `sim.advance()`")
@@ -153,7 +331,82 @@ class Simulator:
 
         Returns ``True`` if there are any active processes, ``False`` otherwise.
         """
-        return self._engine.advance()
+        start = time.perf_counter()
+        result = self._engine.advance()
+        self._wall_time += time.perf_counter() - start
+        if self._progress:
+            self._check_progress()
+        return result
+
+    @property
+    def counters(self):
+        """Simulation throughput counters.
+
+        Returns a snapshot of the simulated time, the number of delta cycles and clock cycles
+        executed so far, and the wall time spent doing so. See :meth:`add_progress_callback`
+        for a way to observe the counters while the simulation is running.
+        """
+        return _SimulationCounters(
+            now=self._engine.now,
+            delta_cycles=self._engine.delta_cycles,
+            cycles={domain.name: self._engine.clock_cycles(domain.clk)
+                    for domain in self._clocked},
+            wall_time=self._wall_time)
+
+    def add_progress_callback(self, callback, *, cycles=None, domain="sync", interval=None):
+        """Add a progress callback.
+
+        Calls ``callback(counters)``, where ``counters`` is the value of :attr:`counters`,
+        periodically while the simulation is advancing.
+
+        Arguments
+        ---------
+        callback : function
+            Function to call.
+        cycles : None or int
+            If specified, ``callback`` is called every ``cycles`` clock cycles of ``domain``.
+        domain : str or ClockDomain
+            Domain whose clock cycles are counted. Must be driven by :meth:`add_clock`.
+        interval : None or float
+            If specified, ``callback`` is called every ``interval`` seconds of wall time spent
+            advancing the simulation.
+        """
+        if (cycles is None) == (interval is None):
+            raise ValueError("Exactly one of cycles or interval must be specified")
+        if cycles is not None:
+            if not isinstance(cycles, int) or cycles <= 0:
+                raise ValueError("Cycle count must be a positive integer, not {!r}"
+                                 .format(cycles))
+            if isinstance(domain, ClockDomain):
+                pass
+            elif domain in self._fragment.domains:
+                domain = self._fragment.domains[domain]
+            else:
+                raise ValueError("Domain {!r} is not present in simulation"
+                                 .format(domain))
+        else:
+            domain = None
+        self._progress.append(_ProgressCallback(callback,
+            cycles=cycles, domain=domain, interval=interval))
+
+    def _check_progress(self):
+        counters = None
+        for progress in self._progress:
+            if progress.domain is not None:
+                if progress.domain not in self._clocked:
+                    continue
+                current = self._engine.clock_cycles(progress.domain.clk)
+            else:
+                current = self._wall_time
+            if current < progress.deadline:
+                continue
+            if progress.domain is not None:
+                progress.deadline = current - current % progress.cycles + progress.cycles
+            else:
+                progress.deadline = current + progress.interval
+            if counters is None:
+                counters = self.counters
+            progress.callback(counters)
 
     def run(self):
         """Run the simulation while any processes are active.
@@ -178,7 +431,9 @@ class Simulator:
         while (self.advance() or run_passive) and self._engine.now < deadline:
             pass
 
-    def write_vcd(self, vcd_file, gtkw_file=None, *, traces=()):
+    def write_vcd(self, vcd_file, gtkw_file=None, *, traces=(),
+                  include=None, exclude=None, depth=None, signals=None, background=False,
+                  compression=None):
         """Write waveforms to a Value Change Dump file, optionally populating a GTKWave save file.
 
         This method returns a context manager. It can be used as: ::
@@ -195,12 +450,236 @@ class Simulator:
         gtkw_file : str or file-like object
             GTKWave save file or filename.
         traces : iterable of Signal
-            Signals to display traces for.
+            Signals to display traces for. These signals are always written.
+        include : str or iterable of str
+            If specified, only signals whose hierarchical name (such as ``"top.uart.tx.data"``)
+            matches one of these :mod:`fnmatch` patterns are written.
+        exclude : str or iterable of str
+            If specified, signals whose hierarchical name matches one of these :mod:`fnmatch`
+            patterns are not written.
+        depth : int
+            If specified, only signals in the toplevel module and in up to ``depth`` levels of
+            submodules are written.
+        signals : iterable of Signal
+            If specified, only these signals are written.
+        background : bool
+            If ``True``, changes are recorded in batches and formatted and written by
+            a background thread. The simulation waits for the thread if it falls too far behind.
+        compression : str
+            If ``vcd_file`` is a filename, compress it with ``"gzip"``, ``"xz"``, or ``"zstd"``
+            (which requires the ``zstandard`` package, installed with the ``sim-zstd`` extra).
+            By default, the compression is chosen by the suffix of the filename (``.gz``,
+            ``.xz``, or ``.zst``), if any.
+
+        Signals that are not written are not tracked at all, which can make simulation
+        significantly faster for large designs.
         """
-        if self._engine.now != 0.0:
+        error = None
+        if depth is not None and (not isinstance(depth, int) or depth < 0):
+            error = ValueError("Depth must be a non-negative integer, not {!r}"
+                               .format(depth))
+        elif compression not in (None, "gzip", "xz", "zstd"):
+            error = ValueError("Compression must be one of None, 'gzip', 'xz', or 'zstd', not {!r}"
+                               .format(compression))
+        elif compression is not None and not isinstance(vcd_file, str):
+            error = ValueError("Compression can only be used when writing to a filename")
+        elif self._engine.now != 0.0:
+            error = ValueError("Cannot start writing waveforms after advancing simulation time")
+
+        if error is not None:
             for file in (vcd_file, gtkw_file):
                 if hasattr(file, "close"):
                     file.close()
-            raise ValueError("Cannot start writing waveforms after advancing simulation time")
+            raise error
+
+        return self._engine.write_vcd(vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+                                      include=include, exclude=exclude, depth=depth,
+                                      signals=signals, background=background,
+                                      compression=compression)
+
+    def write_columnar(self, file, *, traces=(), include=None, exclude=None, depth=None,
+                       signals=None, block_size=65536):
+        """Write waveforms to a file in the compact columnar format.
+
+        This method returns a context manager, and is used like :meth:`write_vcd`. The format,
+        described in :mod:`nmigen.sim.columnar`, is compressed and buffered in blocks, and is
+        much faster to write and much smaller than a Value Change Dump file. Waveforms can be read
+        back with :func:`nmigen.sim.columnar.read_columnar`.
 
-        return self._engine.write_vcd(vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces)
+        Arguments
+        ---------
+        file : str or binary file-like object
+            Waveform file or filename.
+        block_size : int
+            Number of changes buffered in memory before they are compressed and written.
+
+        The ``traces``, ``include``, ``exclude``, ``depth``, and ``signals`` arguments select
+        the signals to write, and are the same as for :meth:`write_vcd`. Since GTKWave cannot
+        read this format, the signals in ``traces`` are only marked in the file.
+        """
+        error = None
+        if not isinstance(block_size, int) or block_size < 1:
+            error = ValueError("Block size must be a positive integer, not {!r}"
+                               .format(block_size))
+        elif depth is not None and (not isinstance(depth, int) or depth < 0):
+            error = ValueError("Depth must be a non-negative integer, not {!r}"
+                               .format(depth))
+        elif self._engine.now != 0.0:
+            error = ValueError("Cannot start writing waveforms after advancing simulation time")
+
+        if error is not None:
+            if hasattr(file, "close"):
+                file.close()
+            raise error
+
+        return self._engine.write_columnar(file=file, traces=traces, include=include,
+                                           exclude=exclude, depth=depth, signals=signals,
+                                           block_size=block_size)
+
+    def capture_vcd(self, vcd_file, gtkw_file=None, *, before, after=0, trigger=None,
+                    size=65536, traces=(), include=None, exclude=None, depth=None,
+                    signals=None):
+        """Capture a window of waveforms around a trigger, like a logic analyzer.
+
+        This method returns a context manager that yields a capture object. While the context
+        manager is active, the most recent changes of the traced signals are kept in memory,
+        and nothing is written. The capture is triggered once any of the following happens:
+
+        * ``trigger`` becomes non-zero;
+        * the ``trigger()`` method of the capture object is called;
+        * an exception (for example, a failed assertion in a process) is raised within
+          the context manager.
+
+        Once triggered, the changes from ``before`` seconds before the trigger up to ``after``
+        seconds after the trigger are written to a Value Change Dump file, optionally populating
+        a GTKWave save file. Only the first trigger is captured, and if the capture is never
+        triggered, no files are written. It can be used as: ::
+
+            sim = Simulator(frag)
+            sim.add_clock(1e-6)
+            with sim.capture_vcd("fail.vcd", before=1e-4, after=1e-5, trigger=frag.error):
+                sim.run_until(1e+1)
+
+        Arguments
+        ---------
+        vcd_file : str or file-like object
+            Verilog Value Change Dump file or filename.
+        gtkw_file : str or file-like object
+            GTKWave save file or filename.
+        before : float
+            Time before the trigger to capture, in seconds.
+        after : float
+            Time after the trigger to capture, in seconds.
+        trigger : Signal
+            Signal that triggers the capture.
+        size : int
+            Maximum number of changes kept in memory. If more changes happen within ``before``
+            seconds, the captured window is shorter.
+
+        The ``traces``, ``include``, ``exclude``, ``depth``, and ``signals`` arguments select
+        the signals to trace, and are the same as for :meth:`write_vcd`.
+        """
+        error = None
+        if not isinstance(before, (int, float)) or before < 0:
+            error = ValueError("Capture time before trigger must be a non-negative number, not {!r}"
+                               .format(before))
+        elif not isinstance(after, (int, float)) or after < 0:
+            error = ValueError("Capture time after trigger must be a non-negative number, not {!r}"
+                               .format(after))
+        elif not isinstance(size, int) or size < 1:
+            error = ValueError("Capture buffer size must be a positive integer, not {!r}"
+                               .format(size))
+        elif trigger is not None and not isinstance(trigger, Signal):
+            error = TypeError("Capture trigger must be a signal, not {!r}"
+                              .format(trigger))
+        elif depth is not None and (not isinstance(depth, int) or depth < 0):
+            error = ValueError("Depth must be a non-negative integer, not {!r}"
+                               .format(depth))
+
+        if error is not None:
+            for file in (vcd_file, gtkw_file):
+                if hasattr(file, "close"):
+                    file.close()
+            raise error
+
+        return self._engine.capture_vcd(vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+                                        include=include, exclude=exclude, depth=depth,
+                                        signals=signals, before=before, after=after, size=size,
+                                        trigger=trigger)
+
+    def record(self, signals, *, domain=None):
+        """Record the values of signals in memory.
+
+        This method returns a context manager that yields a recording. If ``domain`` is
+        specified, the values of ``signals`` are sampled at every active edge of its clock, just
+        before the edge, the same way a flip-flop in that domain would sample them. Otherwise,
+        every change of every signal is recorded, starting with their current values. It can be
+        used as: ::
+
+            sim = Simulator(frag)
+            sim.add_clock(1e-6)
+            with sim.record([frag.out], domain="sync") as recording:
+                sim.run_until(1e-3)
+            out = recording[frag.out]["values"]
+
+        Indexing the recording with a signal returns its ``"timestamps"`` and ``"values"`` as
+        NumPy arrays, and requires NumPy to be installed.
+
+        Arguments
+        ---------
+        signals : iterable of Signal
+            Signals to record.
+        domain : str or ClockDomain
+            Clock domain to sample the signals in.
+        """
+        signals = list(signals)
+        for signal in signals:
+            if not isinstance(signal, Signal):
+                raise TypeError("Object {!r} is not a signal"
+                                .format(signal))
+        if domain is None or isinstance(domain, ClockDomain):
+            pass
+        elif domain in self._fragment.domains:
+            domain = self._fragment.domains[domain]
+        else:
+            raise ValueError("Domain {!r} is not present in simulation"
+                             .format(domain))
+
+        return self._engine.record(signals=signals, domain=domain)
+
+    def coverage(self):
+        """Get the coverage of the design collected so far.
+
+        Coverage is only collected if the simulator was created with the ``coverage`` argument.
+        With branch coverage, every case of every ``Switch`` statement (including those created
+        with ``If``, ``Switch``, and ``FSM``) counts how many times it was taken; with toggle
+        coverage, every signal records which of its bits have toggled. This method returns
+        a snapshot of the coverage, which has the attributes ``branches`` and ``toggles``,
+        and a ``format()`` method. It can be used as: ::
+
+            sim = Simulator(frag, coverage=True)
+            sim.add_clock(1e-6)
+            sim.run_until(1e-3)
+            print(sim.coverage().format())
+
+        Coverage is accumulated across :meth:`reset`.
+        """
+        return self._engine.coverage()
+
+    def profile(self):
+        """Profile the simulation.
+
+        This method returns a context manager that yields a profile, which records how many times
+        every process was run, how much wall time it took, and how many signal changes it made,
+        as well as how many delta cycles were executed at every timestep. It can be used as: ::
+
+            sim = Simulator(frag)
+            sim.add_clock(1e-6)
+            with sim.profile() as profile:
+                sim.run_until(1e-3)
+            print(profile.format())
+
+        Processes compiled from HDL are identified by the same hierarchical names as the ones
+        used in waveform files.
+        """
+        return self._engine.profile()
@@ -0,0 +1,67 @@
+from .pysim import _PySimulation, PySimEngine
+from ._pycxxrtl import PyCxxrtlProcess
+
+
+__all__ = ["CxxSimEngine"]
+
+
+class _CxxSimulation(_PySimulation):
+    def __init__(self):
+        super().__init__()
+        self.design = None
+
+    def get_signal(self, signal):
+        try:
+            return self.signals[signal]
+        except KeyError:
+            index = super().get_signal(signal)
+            # Signals driven by the compiled design are only copied out of it once something
+            # in the simulation (a process, a trigger, or a waveform writer) refers to them.
+            if self.design is not None:
+                self.design.add_output(self.slots[index])
+            return index
+
+
+class _CxxProcessSet:
+    # The compiled design is always run after every other process. This way, the values of
+    # the signals of the design that are first referred to by other processes during a delta cycle
+    # are the values from the previous delta cycle, and not the ones it is about to queue.
+    def __init__(self, design):
+        self.design    = design
+        self.processes = set()
+
+    def add(self, process):
+        self.processes.add(process)
+
+    def __iter__(self):
+        yield from self.processes
+        yield self.design
+
+
+class CxxSimEngine(PySimEngine):
+    """Simulation engine that runs the entire design natively.
+
+    The design is translated to C++ with CXXRTL, compiled, and loaded with :mod:`ctypes`, while
+    the clocks and all processes added with :meth:`Simulator.add_process` and
+    :meth:`Simulator.add_sync_process` run in Python, exactly like with the ``"pysim"`` engine.
+    Signals that are not driven by the design can be written by processes, and any named signal
+    of the design can be read; the contents of memories cannot be read. Requires Yosys and
+    a C++ compiler.
+
+    To reduce build times for large designs, set the ``NMIGEN_cxxrtl_units`` environment variable
+    to the number of translation units the generated code should be split into.
+    """
+    def __init__(self, fragment, *, coverage=()):
+        if coverage:
+            raise NotImplementedError("Coverage cannot be collected with the cxxsim engine")
+        super().__init__(fragment)
+
+    def _create_state(self):
+        return _CxxSimulation()
+
+    def _compile_fragment(self, fragment):
+        # Subfragments simulated by other processes may have been detached from the design after
+        # it was prepared, and the signals they drive are now inputs of the compiled design.
+        fragment._propagate_ports(ports=(), all_undef_as_ports=True)
+        self._state.design = PyCxxrtlProcess(self._state, fragment, opt_level="g")
+        return _CxxProcessSet(self._state.design)
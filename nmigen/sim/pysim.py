@@ -1,22 +1,33 @@
 from contextlib import contextmanager
-import itertools
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from array import array
+import io
+import os
+import sys
+import time
+import queue
+import threading
 from vcd import VCDWriter
 from vcd.gtkw import GTKWSave
 
 from ..hdl import *
-from ..hdl.ast import SignalDict
+from ..hdl.ast import SignalDict, SignalSet
 from ._base import *
-from ._pyrtl import _FragmentCompiler
+from ._pyrtl import _FragmentCompiler, PyRTLProcess, PyRTLCoverage
 from ._pycoro import PyCoroProcess
 from ._pyclock import PyClockProcess
+from ._pycxxrtl import PyCxxrtlProcess
+from .columnar import ColumnarWriter
 
 
 __all__ = ["PySimEngine"]
 
 
 class _NameExtractor:
-    def __init__(self):
+    def __init__(self, *, depth=None):
         self.names = SignalDict()
+        self.depth = depth
 
     def __call__(self, fragment, *, hierarchy=("top",)):
         def add_signal_name(signal):
@@ -38,6 +49,9 @@ class _NameExtractor:
                 if not isinstance(signal, (ClockSignal, ResetSignal)):
                     add_signal_name(signal)
 
+        if self.depth is not None and len(hierarchy) > self.depth:
+            return self.names
+
         for subfragment_index, (subfragment, subfragment_name) in enumerate(fragment.subfragments):
             if subfragment_name is None:
                 subfragment_name = "U${}".format(subfragment_index)
@@ -46,22 +60,82 @@ class _NameExtractor:
         return self.names
 
 
+class _VCDDecoder:
+    """Decodes the values of a signal with a decoder for a waveform file, memoizing the results.
+
+    At most ``limit`` results are memoized, so that wide signals do not use unbounded memory.
+    The values of an ``Enum`` are decoded in advance.
+    """
+    __slots__ = ("signal", "cache", "limit")
+
+    def __init__(self, signal, *, limit=4096):
+        self.signal = signal
+        self.cache  = dict()
+        self.limit  = limit
+        if signal._enum_class is not None:
+            for member in signal._enum_class:
+                self(member.value)
+
+    def __call__(self, value):
+        try:
+            return self.cache[value]
+        except KeyError:
+            string = self.signal.decoder(value).expandtabs().replace(" ", "_")
+            if len(self.cache) < self.limit:
+                self.cache[value] = string
+            return string
+
+
+def _open_vcd_file(filename, compression=None):
+    if compression is None:
+        compression = _VCD_COMPRESSION_SUFFIXES.get(os.path.splitext(filename)[1])
+    if compression is None:
+        return open(filename, "wt")
+
+    if compression == "gzip":
+        import gzip
+        file = gzip.open(filename, "wb")
+    elif compression == "xz":
+        import lzma
+        file = lzma.open(filename, "wb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Compressing waveforms with zstd requires the zstandard package, "
+                              "which is installed with the 'sim-zstd' extra of nmigen") from None
+        file = zstandard.open(filename, "wb")
+    else:
+        assert False
+    # Compressors are much faster when given large chunks of data at once.
+    return io.TextIOWrapper(io.BufferedWriter(file, buffer_size=1 << 20), encoding="utf-8")
+
+
+_VCD_COMPRESSION_SUFFIXES = {
+    ".gz":  "gzip",
+    ".xz":  "xz",
+    ".zst": "zstd",
+}
+
+
 class _VCDWriter:
     @staticmethod
     def timestamp_to_vcd(timestamp):
         return timestamp * (10 ** 10) # 1/(100 ps)
 
-    @staticmethod
-    def decode_to_vcd(signal, value):
-        return signal.decoder(value).expandtabs().replace(" ", "_")
-
-    def __init__(self, fragment, *, vcd_file, gtkw_file=None, traces=()):
+    def __init__(self, state, fragment, *, vcd_file, gtkw_file=None, traces=(),
+                 include=None, exclude=None, depth=None, signals=None, init=None,
+                 compression=None):
         if isinstance(vcd_file, str):
-            vcd_file = open(vcd_file, "wt")
+            self.vcd_filename = vcd_file
+            vcd_file = _open_vcd_file(vcd_file, compression)
+        else:
+            self.vcd_filename = getattr(vcd_file, "name", None)
         if isinstance(gtkw_file, str):
             gtkw_file = open(gtkw_file, "wt")
 
         self.vcd_vars = SignalDict()
+        self.vcd_decoders = SignalDict()
         self.vcd_file = vcd_file
         self.vcd_writer = vcd_file and VCDWriter(self.vcd_file,
             timescale="100 ps", comment="Generated by nMigen")
@@ -71,27 +145,29 @@ class _VCDWriter:
         self.gtkw_save = gtkw_file and GTKWSave(self.gtkw_file)
 
         self.traces = []
+        self.signal_states = []
 
-        signal_names = _NameExtractor()(fragment)
-
-        trace_names = SignalDict()
-        for trace in traces:
-            if trace not in signal_names:
-                trace_names[trace] = {("top", trace.name)}
-            self.traces.append(trace)
+        signal_names = self.select_names(fragment, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals)
+        self.traces.extend(traces)
 
         if self.vcd_writer is None:
             return
 
-        for signal, names in itertools.chain(signal_names.items(), trace_names.items()):
+        for signal, names in signal_names.items():
+            if init is None:
+                value = signal.reset
+            else:
+                value = init[signal]
             if signal.decoder:
                 var_type = "string"
                 var_size = 1
-                var_init = self.decode_to_vcd(signal, signal.reset)
+                self.vcd_decoders[signal] = _VCDDecoder(signal)
+                var_init = self.vcd_decoders[signal](value)
             else:
                 var_type = "wire"
                 var_size = signal.width
-                var_init = signal.reset
+                var_init = value
 
             for (*var_scope, var_name) in names:
                 suffix = None
@@ -117,25 +193,72 @@ class _VCDWriter:
                 if signal not in self.gtkw_names:
                     self.gtkw_names[signal] = (*var_scope, var_name_suffix)
 
-    def update(self, timestamp, signal, value):
-        vcd_var = self.vcd_vars.get(signal)
-        if vcd_var is None:
-            return
+        # Every traced signal refers to the writer directly, so that changes of signals that are
+        # not traced cost nothing. Without a simulation state, the changes are forwarded by
+        # the caller instead.
+        if state is not None:
+            for signal, vcd_var in self.vcd_vars.items():
+                signal_state = state.slots[state.get_signal(signal)]
+                signal_state.tracers += ((self, vcd_var),)
+                self.signal_states.append(signal_state)
+
+    @classmethod
+    def select_names(cls, fragment, *, traces=(), include=None, exclude=None, depth=None,
+                     signals=None):
+        signal_names = _NameExtractor(depth=depth)(fragment)
+        if include is not None or exclude is not None or signals is not None:
+            signal_names = cls._filter_names(signal_names,
+                include=include, exclude=exclude, signals=signals)
+        for trace in traces:
+            if trace not in signal_names:
+                signal_names[trace] = {("top", trace.name)}
+        return signal_names
 
+    @staticmethod
+    def _filter_names(signal_names, *, include, exclude, signals):
+        if isinstance(include, str):
+            include = (include,)
+        if isinstance(exclude, str):
+            exclude = (exclude,)
+        if signals is not None:
+            signals = SignalSet(signals)
+
+        filtered_names = SignalDict()
+        for signal, names in signal_names.items():
+            if signals is not None and signal not in signals:
+                continue
+            names = {name for name in names
+                     if (include is None or
+                            any(fnmatchcase(".".join(name), pattern) for pattern in include)) and
+                        (exclude is None or
+                            not any(fnmatchcase(".".join(name), pattern) for pattern in exclude))}
+            if names:
+                filtered_names[signal] = names
+        return filtered_names
+
+    def update(self, timestamp, signal, vcd_var, value):
         vcd_timestamp = self.timestamp_to_vcd(timestamp)
         if signal.decoder:
-            var_value = self.decode_to_vcd(signal, value)
+            var_value = self.vcd_decoders[signal](value)
         else:
             var_value = value
         self.vcd_writer.change(vcd_var, vcd_timestamp, var_value)
 
     def close(self, timestamp):
+        for signal_state in self.signal_states:
+            signal_state.tracers = tuple((writer, vcd_var)
+                                         for writer, vcd_var in signal_state.tracers
+                                         if writer is not self)
+
         if self.vcd_writer is not None:
             self.vcd_writer.close(self.timestamp_to_vcd(timestamp))
 
         if self.gtkw_save is not None:
-            self.gtkw_save.dumpfile(self.vcd_file.name)
-            self.gtkw_save.dumpfile_size(self.vcd_file.tell())
+            self.gtkw_save.dumpfile(self.vcd_filename)
+            try:
+                self.gtkw_save.dumpfile_size(self.vcd_file.tell())
+            except (OSError, ValueError):
+                pass # not known for some compressed files
 
             self.gtkw_save.treeopen("top")
             for signal in self.traces:
@@ -151,6 +274,458 @@ class _VCDWriter:
             self.gtkw_file.close()
 
 
+class _BackgroundVCDWriter:
+    """Forwards changes to a waveform writer that runs on a background thread.
+
+    Changes are recorded into preallocated buffers of ``batch_size`` records, each record taking
+    four consecutive items, so that formatting and writing them happens off the critical path of
+    the simulation. There are ``queue_size`` buffers, which are passed to the writer thread when
+    full and reused once written; if the writer falls behind, the simulation waits for it.
+    """
+    def __init__(self, state, writer, *, batch_size=4096, queue_size=16):
+        self.writer = writer
+        self.full_buffers = queue.Queue()
+        self.free_buffers = queue.Queue()
+        for _ in range(queue_size):
+            self.free_buffers.put([None] * (4 * batch_size))
+        self.buffer = self.free_buffers.get()
+        self.index  = 0
+        self.error  = None
+
+        self.signal_states = []
+        for signal, vcd_var in writer.vcd_vars.items():
+            signal_state = state.slots[state.get_signal(signal)]
+            signal_state.tracers += ((self, vcd_var),)
+            self.signal_states.append(signal_state)
+
+        self.thread = threading.Thread(target=self._run, name="nmigen-vcd-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.full_buffers.get()
+            if item is None:
+                return
+            buffer, count = item
+            # Keep draining the buffers after an error, so that the simulation never blocks.
+            if self.error is None:
+                try:
+                    update = self.writer.update
+                    for index in range(0, count, 4):
+                        update(*buffer[index:index + 4])
+                except Exception as error:
+                    self.error = error
+            self.free_buffers.put(buffer)
+
+    def update(self, timestamp, signal, vcd_var, value):
+        buffer, index = self.buffer, self.index
+        buffer[index]     = timestamp
+        buffer[index + 1] = signal
+        buffer[index + 2] = vcd_var
+        buffer[index + 3] = value
+        self.index = index = index + 4
+        if index == len(buffer):
+            if self.error is not None:
+                raise self.error
+            self.full_buffers.put((buffer, index))
+            self.buffer = self.free_buffers.get()
+            self.index  = 0
+
+    def close(self, timestamp):
+        for signal_state in self.signal_states:
+            signal_state.tracers = tuple((writer, vcd_var)
+                                         for writer, vcd_var in signal_state.tracers
+                                         if writer is not self)
+
+        self.full_buffers.put((self.buffer, self.index))
+        self.full_buffers.put(None)
+        self.thread.join()
+        self.buffer = None
+        self.writer.close(timestamp)
+        # This is called while unwinding if the simulation raised an exception, which must not be
+        # replaced with the error of the writer.
+        if self.error is not None and sys.exc_info()[1] is None:
+            raise self.error
+
+
+class _ColumnarTracer(ColumnarWriter):
+    def __init__(self, state, fragment, *, file, traces=(), include=None, exclude=None,
+                 depth=None, signals=None, block_size=65536):
+        super().__init__(file, timescale=1e-10, block_size=block_size)
+        self.signal_states = []
+
+        trace_signals = SignalSet(traces)
+        signal_names = _VCDWriter.select_names(fragment, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals)
+        for signal, names in signal_names.items():
+            index = self.add_signal(sorted(names), width=signal.width,
+                signed=signal.signed, reset=signal.reset, trace=signal in trace_signals)
+            signal_state = state.slots[state.get_signal(signal)]
+            signal_state.tracers += ((self, index),)
+            self.signal_states.append(signal_state)
+
+    def update(self, timestamp, signal, index, value):
+        # Same as `change()`, inlined, since this is called for every change of every signal.
+        self._times[index].append(timestamp)
+        self._values[index].append(value)
+        self._count += 1
+        if self._count >= self.block_size:
+            self.flush()
+
+    def close(self, timestamp):
+        for signal_state in self.signal_states:
+            signal_state.tracers = tuple((writer, vcd_var)
+                                         for writer, vcd_var in signal_state.tracers
+                                         if writer is not self)
+        super().close(timestamp)
+
+
+class _VCDCapture:
+    """Keeps the most recent changes of the traced signals in a ring buffer, and writes them to
+    a Value Change Dump file once triggered, like a logic analyzer.
+
+    The ring buffer holds up to ``size`` changes. Changes that are evicted from it, or that are
+    older than ``before`` seconds at the time of the trigger, are folded into the initial values
+    of the waveform file. After the trigger, changes are written directly for ``after`` seconds.
+    Only the first trigger is captured.
+    """
+    def __init__(self, state, timeline, fragment, *, vcd_file, gtkw_file=None, traces=(),
+                 include=None, exclude=None, depth=None, signals=None,
+                 before, after=0, size=65536, trigger=None):
+        self.timeline = timeline
+        self.fragment = fragment
+        self.writer_kwargs = dict(vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals)
+        self.before = before
+        self.after  = after
+
+        self.signals = list(_VCDWriter.select_names(fragment, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals))
+        self.signal_states = []
+        self.values = []
+        for index, signal in enumerate(self.signals):
+            signal_state = state.slots[state.get_signal(signal)]
+            signal_state.tracers += ((self, index),)
+            self.signal_states.append(signal_state)
+            self.values.append(signal_state.curr)
+        if trigger is not None:
+            signal_state = state.slots[state.get_signal(trigger)]
+            signal_state.tracers += ((self, None),)
+            self.signal_states.append(signal_state)
+
+        # The ring buffer is preallocated, and stored as three parallel lists to avoid creating
+        # an object for every change.
+        self.size = size
+        self.record_times   = [0.0] * size
+        self.record_indices = [0]   * size
+        self.record_values  = [0]   * size
+        self.record_count   = 0
+
+        self.writer = None
+        self.trigger_time = None
+
+    @property
+    def triggered(self):
+        return self.trigger_time is not None
+
+    def trigger(self):
+        """Write the captured changes and keep writing changes for ``after`` seconds.
+
+        Does nothing if the capture has already been triggered.
+        """
+        if self.triggered:
+            return
+        self.trigger_time = now = self.timeline.now
+
+        start = max(0, self.record_count - self.size)
+        while start < self.record_count:
+            position = start % self.size
+            if self.record_times[position] >= now - self.before:
+                break
+            self.values[self.record_indices[position]] = self.record_values[position]
+            start += 1
+
+        self.writer = _VCDWriter(None, self.fragment, **self.writer_kwargs,
+            init=SignalDict(zip(self.signals, self.values)))
+        for record in range(start, self.record_count):
+            position = record % self.size
+            signal = self.signals[self.record_indices[position]]
+            self._write(self.record_times[position], signal, self.record_values[position])
+
+    def _write(self, timestamp, signal, value):
+        vcd_var = self.writer.vcd_vars.get(signal)
+        if vcd_var is not None:
+            self.writer.update(timestamp, signal, vcd_var, value)
+
+    def update(self, timestamp, signal, index, value):
+        if index is None:
+            if value and not self.triggered:
+                self.trigger()
+            return
+
+        if self.writer is not None:
+            if timestamp <= self.trigger_time + self.after:
+                self._write(timestamp, signal, value)
+            return
+
+        position = self.record_count % self.size
+        if self.record_count >= self.size:
+            # Evict the oldest change.
+            self.values[self.record_indices[position]] = self.record_values[position]
+        self.record_times[position]   = timestamp
+        self.record_indices[position] = index
+        self.record_values[position]  = value
+        self.record_count += 1
+
+    def close(self, timestamp):
+        for signal_state in self.signal_states:
+            signal_state.tracers = tuple((writer, vcd_var)
+                                         for writer, vcd_var in signal_state.tracers
+                                         if writer is not self)
+
+        if self.writer is not None:
+            self.writer.close(min(timestamp, self.trigger_time + self.after))
+        else:
+            for file in (self.writer_kwargs["vcd_file"], self.writer_kwargs["gtkw_file"]):
+                if hasattr(file, "close"):
+                    file.close()
+
+
+class _PySimRecording:
+    """Signal values recorded by :meth:`Simulator.record`.
+
+    Indexing the recording with a signal returns a dict with the keys ``"timestamps"`` (in
+    seconds) and ``"values"``, each a NumPy array; this requires NumPy. Values of signals that
+    are wider than 64 bits are returned as arrays of Python integers. The :meth:`samples` method
+    returns the same data as a list of ``(timestamp, value)`` pairs, and does not require NumPy.
+    """
+    def __init__(self, state, timeline, signals, *, domain=None):
+        self._indices = SignalDict()
+        self._signal_states = []
+        self._values = []
+        for signal in signals:
+            if signal in self._indices:
+                continue
+            self._indices[signal] = len(self._signal_states)
+            self._signal_states.append(state.slots[state.get_signal(signal)])
+            if signal.width <= 63 or signal.signed and signal.width == 64:
+                self._values.append(array("q"))
+            elif signal.width == 64:
+                self._values.append(array("Q"))
+            else:
+                self._values.append([])
+
+        self._tracer_states = []
+        if domain is None:
+            # Every change is recorded, starting with the current value of every signal.
+            self._edge = None
+            self._timestamps = []
+            for index, signal_state in enumerate(self._signal_states):
+                self._timestamps.append(array("d", [timeline.now]))
+                self._values[index].append(signal_state.curr)
+                signal_state.tracers += ((self, index),)
+                self._tracer_states.append(signal_state)
+        else:
+            # The values are sampled just before every active edge of the clock, the same way
+            # a flip-flop would sample them.
+            self._edge = 1 if domain.clk_edge == "pos" else 0
+            self._timestamps = array("d")
+            clock_state = state.slots[state.get_signal(domain.clk)]
+            clock_state.tracers += ((self, None),)
+            self._tracer_states.append(clock_state)
+
+    def update(self, timestamp, signal, index, value):
+        if index is None:
+            if value == self._edge:
+                self._timestamps.append(timestamp)
+                for values, signal_state in zip(self._values, self._signal_states):
+                    values.append(signal_state.curr)
+        else:
+            self._timestamps[index].append(timestamp)
+            self._values[index].append(value)
+
+    def close(self, timestamp):
+        for signal_state in self._tracer_states:
+            signal_state.tracers = tuple((writer, vcd_var)
+                                         for writer, vcd_var in signal_state.tracers
+                                         if writer is not self)
+
+    def _columns(self, signal):
+        index = self._indices[signal]
+        if self._edge is None:
+            return self._timestamps[index], self._values[index]
+        else:
+            return self._timestamps, self._values[index]
+
+    def __iter__(self):
+        yield from self._indices.keys()
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, signal):
+        import numpy
+
+        timestamps, values = self._columns(signal)
+        if isinstance(values, array):
+            values = numpy.frombuffer(values, dtype=values.typecode).copy()
+        else:
+            values = numpy.array(values, dtype=object)
+        return {
+            "timestamps": numpy.frombuffer(timestamps, dtype=numpy.float64).copy(),
+            "values":     values,
+        }
+
+    def samples(self, signal):
+        return list(zip(*self._columns(signal)))
+
+
+class _ProcessProfile:
+    __slots__ = ("runs", "time", "changes")
+
+    def __init__(self):
+        self.runs    = 0
+        self.time    = 0.0
+        self.changes = 0
+
+    def __repr__(self):
+        return "<runs={} time={:.6f}s changes={}>".format(self.runs, self.time, self.changes)
+
+
+class _PySimProfile:
+    """Simulation profile.
+
+    Attributes
+    ----------
+    processes : dict of (tuple of str, str) to profile
+        Statistics for every process compiled from HDL, keyed by the hierarchical name of
+        the fragment it was compiled from and its domain (``"comb"`` for combinatorial logic, or
+        ``"cxxrtl"`` for fragments compiled with CXXRTL).
+    coroutines : dict of str to profile
+        Statistics for every process added with :meth:`Simulator.add_process`,
+        :meth:`Simulator.add_sync_process` or :meth:`Simulator.add_clock`, keyed by
+        the qualified name of the process function.
+    delta_cycles : dict of float to int
+        Number of delta cycles executed at every timestamp.
+
+    Every profile has the attributes ``runs`` (how many times the process was run or woken up),
+    ``time`` (cumulative wall time spent running it, in seconds) and ``changes`` (how many signal
+    changes it has queued).
+    """
+    def __init__(self):
+        self.processes    = OrderedDict()
+        self.coroutines   = OrderedDict()
+        self.delta_cycles = OrderedDict()
+        self._profiles    = dict()
+
+    def _profile_for(self, process):
+        if isinstance(process, (PyRTLProcess, PyCxxrtlProcess)):
+            profile = self.processes[process.name] = _ProcessProfile()
+        else:
+            name, suffix = process.name, 0
+            while name in self.coroutines:
+                suffix += 1
+                name = "{}${}".format(process.name, suffix)
+            profile = self.coroutines[name] = _ProcessProfile()
+        self._profiles[process] = profile
+        return profile
+
+    def run(self, timestamp, processes, pending):
+        self.delta_cycles[timestamp] = self.delta_cycles.get(timestamp, 0) + 1
+        for process in processes:
+            if process.runnable:
+                try:
+                    profile = self._profiles[process]
+                except KeyError:
+                    profile = self._profile_for(process)
+                process.runnable = False
+                pending_before = len(pending)
+                start = time.perf_counter()
+                process.run()
+                profile.time += time.perf_counter() - start
+                profile.runs += 1
+                profile.changes += len(pending) - pending_before
+
+    def format(self, *, limit=None):
+        """Format the profile as a human-readable table, sorted by time spent in each process."""
+        rows = []
+        for (hierarchy, domain), profile in self.processes.items():
+            rows.append(("{} ({})".format(".".join(hierarchy), domain), profile))
+        for name, profile in self.coroutines.items():
+            rows.append((name, profile))
+        rows.sort(key=lambda row: row[1].time, reverse=True)
+        if limit is not None:
+            rows = rows[:limit]
+
+        lines = ["{:>12} {:>10} {:>10}  {}".format("time (s)", "runs", "changes", "process")]
+        for name, profile in rows:
+            lines.append("{:>12.6f} {:>10} {:>10}  {}"
+                         .format(profile.time, profile.runs, profile.changes, name))
+        lines.append("{} delta cycles in {} timesteps"
+                     .format(sum(self.delta_cycles.values()), len(self.delta_cycles)))
+        return "\n".join(lines)
+
+
+class _PySimCoverage:
+    """Simulation coverage.
+
+    Attributes
+    ----------
+    branches : list of (tuple of str, tuple, tuple of str, tuple, int)
+        For every case of every ``Switch`` statement (i.e. every ``If``/``Elif``/``Else``,
+        ``Case``, and FSM state), the hierarchical name of the fragment, the source location of
+        the statement, the patterns of the case (empty for the default case), the source location
+        of the case (or ``None`` if unknown), and how many times the case was taken. Empty unless
+        branch coverage is collected.
+    toggles : list of (tuple of str, Signal, int, int)
+        For every signal, its hierarchical name, the signal, and the masks of the bits that have
+        changed from 0 to 1 and from 1 to 0. Empty unless toggle coverage is collected.
+    """
+    def __init__(self, fragment, state, branch_coverage):
+        self.branches = []
+        if branch_coverage is not None:
+            for case, hits in zip(branch_coverage.cases, branch_coverage.case_hits):
+                self.branches.append((*case, hits))
+
+        self.toggles = []
+        signal_names = _NameExtractor()(fragment)
+        for signal_state in state.slots:
+            if not isinstance(signal_state, _PyToggleSignalState):
+                continue
+            signal = signal_state.signal
+            if signal in signal_names:
+                name = min(signal_names[signal])
+            else:
+                name = ("top", signal.name)
+            mask = (1 << len(signal)) - 1
+            self.toggles.append((name, signal,
+                                 signal_state.rises & mask, signal_state.falls & mask))
+
+    def format(self):
+        """Format the coverage as a human-readable summary, listing every case that was never
+        taken and every signal with bits that have not toggled in both directions."""
+        lines = []
+        if self.branches:
+            taken = sum(1 for *_, hits in self.branches if hits)
+            lines.append("{} of {} cases taken".format(taken, len(self.branches)))
+            for hierarchy, src_loc, patterns, case_src_loc, hits in self.branches:
+                if not hits:
+                    filename, line = case_src_loc or src_loc or ("<unknown>", 0)
+                    lines.append("  {}:{}: {}: case {}".format(filename, line,
+                                 ".".join(hierarchy), " | ".join(patterns) or "(default)"))
+        if self.toggles:
+            total   = sum(len(signal) for _, signal, _, _ in self.toggles)
+            toggled = sum(format(rises & falls, "b").count("1")
+                          for *_, rises, falls in self.toggles)
+            lines.append("{} of {} bits toggled".format(toggled, total))
+            for name, signal, rises, falls in self.toggles:
+                untoggled = ((1 << len(signal)) - 1) & ~(rises & falls)
+                if untoggled:
+                    lines.append("  {}: {:0{}b} not toggled".format(".".join(name),
+                                 untoggled, len(signal)))
+        return "\n".join(lines)
+
+
 class _Timeline:
     def __init__(self):
         self.now = 0.0
@@ -200,12 +775,13 @@ class _Timeline:
 
 
 class _PySignalState(BaseSignalState):
-    __slots__ = ("signal", "curr", "next", "waiters", "pending")
+    __slots__ = ("signal", "curr", "next", "waiters", "pending", "tracers")
 
     def __init__(self, signal, pending):
         self.signal = signal
         self.pending = pending
         self.waiters = dict()
+        self.tracers = ()
         self.curr = self.next = signal.reset
 
     def set(self, value):
@@ -226,12 +802,36 @@ class _PySignalState(BaseSignalState):
         return awoken_any
 
 
+class _PyToggleSignalState(_PySignalState):
+    __slots__ = ("rises", "falls")
+
+    def __init__(self, signal, pending):
+        super().__init__(signal, pending)
+        self.rises = self.falls = 0
+
+    def commit(self):
+        curr, next = self.curr, self.next
+        if curr == next:
+            return False
+        self.rises |= next & ~curr
+        self.falls |= curr & ~next
+        self.curr = next
+
+        awoken_any = False
+        for process, trigger in self.waiters.items():
+            if trigger is None or trigger == next:
+                process.runnable = awoken_any = True
+        return awoken_any
+
+
 class _PySimulation(BaseSimulation):
-    def __init__(self):
+    def __init__(self, *, toggles=False):
         self.timeline = _Timeline()
         self.signals  = SignalDict()
         self.slots    = []
         self.pending  = set()
+        # If true, every signal records which of its bits have toggled.
+        self.signal_state_class = _PyToggleSignalState if toggles else _PySignalState
 
     def reset(self):
         self.timeline.reset()
@@ -244,7 +844,7 @@ class _PySimulation(BaseSimulation):
             return self.signals[signal]
         except KeyError:
             index = len(self.slots)
-            self.slots.append(_PySignalState(signal, self.pending))
+            self.slots.append(self.signal_state_class(signal, self.pending))
             self.signals[signal] = index
             return index
 
@@ -272,41 +872,63 @@ class _PySimulation(BaseSimulation):
 
 
 class PySimEngine(BaseEngine):
-    def __init__(self, fragment):
-        self._state = _PySimulation()
+    def __init__(self, fragment, *, coverage=()):
+        self._branch_coverage = PyRTLCoverage() if "branch" in coverage else None
+        self._toggle_coverage = "toggle" in coverage
+        self._state = self._create_state()
         self._timeline = self._state.timeline
 
         self._fragment = fragment
-        self._processes = _FragmentCompiler(self._state)(self._fragment)
+        self._processes = self._compile_fragment(self._fragment)
         self._vcd_writers = []
+        self._profile = None
+        self._clocks = SignalDict()
+        self._delta_cycles = 0
+
+    def _create_state(self):
+        return _PySimulation(toggles=self._toggle_coverage)
+
+    def _compile_fragment(self, fragment):
+        return _FragmentCompiler(self._state, coverage=self._branch_coverage)(fragment)
 
     def add_coroutine_process(self, process, *, default_cmd):
         self._processes.add(PyCoroProcess(self._state, self._fragment.domains, process,
                                           default_cmd=default_cmd))
 
     def add_clock_process(self, clock, *, phase, period):
-        self._processes.add(PyClockProcess(self._state, clock,
-                                           phase=phase, period=period))
+        process = PyClockProcess(self._state, clock, phase=phase, period=period)
+        self._processes.add(process)
+        self._clocks[clock] = process
+
+    def add_cxxrtl_fragment(self, fragment, *, hierarchy):
+        self._processes.add(PyCxxrtlProcess(self._state, fragment, hierarchy=hierarchy))
 
     def reset(self):
         self._state.reset()
         for process in self._processes:
             process.reset()
+        self._delta_cycles = 0
 
     def _step(self):
         # Performs the two phases of a delta cycle in a loop:
         converged = False
         while not converged:
+            self._delta_cycles += 1
+
             # 1. eval: run and suspend every non-waiting process once, queueing signal changes
-            for process in self._processes:
-                if process.runnable:
-                    process.runnable = False
-                    process.run()
+            if self._profile is None:
+                for process in self._processes:
+                    if process.runnable:
+                        process.runnable = False
+                        process.run()
+            else:
+                self._profile.run(self._timeline.now, self._processes, self._state.pending)
 
-            for vcd_writer in self._vcd_writers:
+            if self._vcd_writers:
                 for signal_state in self._state.pending:
-                    vcd_writer.update(self._timeline.now,
-                        signal_state.signal, signal_state.next)
+                    for vcd_writer, vcd_var in signal_state.tracers:
+                        vcd_writer.update(self._timeline.now,
+                            signal_state.signal, vcd_var, signal_state.next)
 
             # 2. commit: apply every queued signal change, waking up any waiting processes
             converged = self._state.commit()
@@ -320,13 +942,90 @@ class PySimEngine(BaseEngine):
     def now(self):
         return self._timeline.now
 
+    @property
+    def delta_cycles(self):
+        return self._delta_cycles
+
+    def clock_cycles(self, clock):
+        return self._clocks[clock].cycles
+
     @contextmanager
-    def write_vcd(self, *, vcd_file, gtkw_file, traces):
-        vcd_writer = _VCDWriter(self._fragment,
-            vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces)
+    def write_vcd(self, *, vcd_file, gtkw_file, traces,
+                  include=None, exclude=None, depth=None, signals=None, background=False,
+                  compression=None):
+        if background:
+            vcd_writer = _BackgroundVCDWriter(self._state, _VCDWriter(None, self._fragment,
+                vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+                include=include, exclude=exclude, depth=depth, signals=signals,
+                compression=compression))
+        else:
+            vcd_writer = _VCDWriter(self._state, self._fragment,
+                vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+                include=include, exclude=exclude, depth=depth, signals=signals,
+                compression=compression)
         try:
             self._vcd_writers.append(vcd_writer)
             yield
         finally:
             vcd_writer.close(self._timeline.now)
             self._vcd_writers.remove(vcd_writer)
+
+    @contextmanager
+    def write_columnar(self, *, file, traces, include=None, exclude=None, depth=None,
+                       signals=None, block_size):
+        tracer = _ColumnarTracer(self._state, self._fragment, file=file, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals,
+            block_size=block_size)
+        try:
+            self._vcd_writers.append(tracer)
+            yield
+        finally:
+            tracer.close(self._timeline.now)
+            self._vcd_writers.remove(tracer)
+
+    @contextmanager
+    def capture_vcd(self, *, vcd_file, gtkw_file, traces, include=None, exclude=None,
+                    depth=None, signals=None, before, after, size, trigger):
+        vcd_capture = _VCDCapture(self._state, self._timeline, self._fragment,
+            vcd_file=vcd_file, gtkw_file=gtkw_file, traces=traces,
+            include=include, exclude=exclude, depth=depth, signals=signals,
+            before=before, after=after, size=size, trigger=trigger)
+        try:
+            self._vcd_writers.append(vcd_capture)
+            yield vcd_capture
+        except Exception:
+            # Failing to write the capture must not hide the exception that triggered it.
+            try:
+                vcd_capture.trigger()
+            except Exception:
+                pass
+            raise
+        finally:
+            vcd_capture.close(self._timeline.now)
+            self._vcd_writers.remove(vcd_capture)
+
+    @contextmanager
+    def record(self, *, signals, domain):
+        recording = _PySimRecording(self._state, self._timeline, signals, domain=domain)
+        try:
+            self._vcd_writers.append(recording)
+            yield recording
+        finally:
+            recording.close(self._timeline.now)
+            self._vcd_writers.remove(recording)
+
+    def coverage(self):
+        if self._branch_coverage is None and not self._toggle_coverage:
+            raise ValueError("Coverage is not being collected")
+        return _PySimCoverage(self._fragment, self._state, self._branch_coverage)
+
+    @contextmanager
+    def profile(self):
+        if self._profile is not None:
+            raise ValueError("Simulation is already being profiled")
+        profile = _PySimProfile()
+        try:
+            self._profile = profile
+            yield profile
+        finally:
+            self._profile = None
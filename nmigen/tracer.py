@@ -1,8 +1,9 @@
 import sys
+from contextlib import contextmanager
 from opcode import opname
 
 
-__all__ = ["NameNotFound", "get_var_name", "get_src_loc"]
+__all__ = ["NameNotFound", "get_var_name", "get_src_loc", "tracking_src_loc"]
 
 
 class NameNotFound(Exception):
@@ -10,12 +11,10 @@ class NameNotFound(Exception):
 
 
 _raise_exception = object()
+_name_not_found  = object()
 
 
-def get_var_name(depth=2, default=_raise_exception):
-    frame = sys._getframe(depth)
-    code = frame.f_code
-    call_index = frame.f_lasti
+def _decode_var_name(code, call_index):
     while True:
         call_opc = opname[code.co_code[call_index]]
         if call_opc in ("EXTENDED_ARG",):
@@ -41,13 +40,58 @@ def get_var_name(depth=2, default=_raise_exception):
                      "DUP_TOP", "BUILD_LIST"):
             index += 2
         else:
-            if default is _raise_exception:
-                raise NameNotFound
-            else:
-                return default
+            return _name_not_found
+
+
+# Maps (id(code), offset) of every call site to a tuple of the code object (which is kept alive,
+# so that its identity is not reused) and the name inferred for it.
+_var_name_cache = {}
+_var_name_cache_size = 65536
+
+
+def get_var_name(depth=2, default=_raise_exception):
+    frame = sys._getframe(depth)
+    key = (id(frame.f_code), frame.f_lasti)
+    try:
+        _, name = _var_name_cache[key]
+    except KeyError:
+        name = _decode_var_name(frame.f_code, frame.f_lasti)
+        if len(_var_name_cache) >= _var_name_cache_size:
+            # Only designs that generate code dynamically are likely to get here.
+            _var_name_cache.clear()
+        _var_name_cache[key] = (frame.f_code, name)
+    if name is _name_not_found:
+        if default is _raise_exception:
+            raise NameNotFound
+        else:
+            return default
+    return name
+
+
+_src_loc_enabled = True
+
+
+@contextmanager
+def tracking_src_loc(enabled=True):
+    """Enable or disable tracking of source locations.
+
+    While source location tracking is disabled, values, statements, and other objects created
+    by nMigen have a ``src_loc`` of ``None``. This makes elaboration faster and reduces its
+    memory usage, but the generated netlists and error messages no longer refer to the Python
+    source code of the design.
+    """
+    global _src_loc_enabled
+    outer_src_loc_enabled = _src_loc_enabled
+    _src_loc_enabled = enabled
+    try:
+        yield
+    finally:
+        _src_loc_enabled = outer_src_loc_enabled
 
 
 def get_src_loc(src_loc_at=0):
+    if not _src_loc_enabled:
+        return None
     # n-th  frame: get_src_loc()
     # n-1th frame: caller of get_src_loc() (usually constructor)
     # n-2th frame: caller of caller (usually user code)
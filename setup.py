@@ -47,6 +47,8 @@ setup(
         # this version requirement needs to be synchronized with the one in nmigen.back.verilog!
         "builtin-yosys": ["nmigen-yosys>=0.9.post3527.*"],
         "remote-build": ["paramiko~=2.7"],
+        "sim-record": ["numpy"],
+        "sim-zstd": ["zstandard"],
     },
     packages=find_packages(exclude=["tests*"]),
     entry_points={
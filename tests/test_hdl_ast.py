@@ -1,6 +1,7 @@
 import warnings
 from enum import Enum
 
+from nmigen import tracer
 from nmigen.hdl.ast import *
 
 from .utils import *
@@ -325,6 +326,7 @@ class ConstTestCase(FHDLTestCase):
 
     def test_normalization(self):
         self.assertEqual(Const(0b10110, signed(5)).value, -10)
+        self.assertEqual(Const(1, signed(0)).value, 0)
 
     def test_value(self):
         self.assertEqual(Const(10).value, 10)
@@ -339,6 +341,15 @@ class ConstTestCase(FHDLTestCase):
 
 
 class OperatorTestCase(FHDLTestCase):
+    def test_shape_signal_changed(self):
+        s = Signal(2)
+        v = Cat(s + 1, Repl(s, 2))
+        self.assertEqual(v.shape(), unsigned(7))
+        s.width = 4
+        self.assertEqual(v.shape(), unsigned(13))
+        s.signed = True
+        self.assertEqual((s + 1).shape(), signed(5))
+
     def test_bool(self):
         v = Const(0, 4).bool()
         self.assertEqual(repr(v), "(b (const 4'd0))")
@@ -736,6 +747,26 @@ class CatTestCase(FHDLTestCase):
         c1 = Cat(Const(10), Const(1))
         self.assertEqual(repr(c1), "(cat (const 4'd10) (const 1'd1))")
 
+    def test_as_const(self):
+        self.assertEqual(Cat(Const(-1, signed(2)), Const(1, 2))._as_const(), 0b0111)
+
+    def test_signals(self):
+        a = Signal()
+        b = Signal()
+        c = Cat(a, b, a)
+        self.assertEqual(c._lhs_signals(), SignalSet((a, b)))
+        self.assertEqual(c._rhs_signals(), SignalSet((a, b)))
+        self.assertIs(c._rhs_signals(), c._rhs_signals())
+        self.assertIs(Cat(a, 1)._rhs_signals(), a._rhs_signals())
+        with self.assertRaisesRegex(TypeError,
+                r"^Cannot modify a frozen signal set$"):
+            c._rhs_signals().add(Signal())
+        s = Signal()
+        signals = c._rhs_signals() | SignalSet((s,))
+        signals.add(Signal())
+        self.assertEqual(len(signals), 4)
+        self.assertEqual(len(c._rhs_signals()), 2)
+
 
 class ReplTestCase(FHDLTestCase):
     def test_shape(self):
@@ -837,6 +868,17 @@ class ArrayProxyTestCase(FHDLTestCase):
         v = a[s]
         self.assertEqual(repr(v), "(proxy (array [1, 2, 3]) (sig s))")
 
+    def test_as_part(self):
+        s = Signal(2)
+        a = Array([Signal(4, name="a"), Signal(4, name="b"), 1, Signal(4, name="c")])
+        self.assertRepr(a[s]._as_part(), """
+        (part (cat (sig a) (sig b) (const 4'd1) (sig c)) (sig s) 4 4)
+        """)
+        self.assertRepr(Array([1, -2, 3])[s]._as_part(), """
+        (part (const 9'd241) (m (< (sig s) (const 2'd3)) (sig s) (const 2'd2)) 3 3)
+        """)
+        self.assertIsNone(Array([Signal(4), Signal(3)])[s]._as_part())
+
 
 class SignalTestCase(FHDLTestCase):
     def test_shape(self):
@@ -875,6 +917,27 @@ class SignalTestCase(FHDLTestCase):
         s2 = Signal(name="sig")
         self.assertEqual(s2.name, "sig")
 
+    def test_name_same_call_site(self):
+        names = []
+        for _ in range(2):
+            s1 = Signal()
+            names.append(s1.name)
+            names.append([Signal() for _ in range(1)][0].name)
+        self.assertEqual(names, ["s1", "$signal", "s1", "$signal"])
+
+    def test_src_loc(self):
+        s1 = Signal()
+        self.assertEqual(s1.src_loc[0], __file__)
+        with tracer.tracking_src_loc(False):
+            s2 = Signal()
+            self.assertEqual(s2.name, "s2")
+            self.assertIsNone(s2.src_loc)
+            self.assertIsNone((s1 + s2).src_loc)
+            with tracer.tracking_src_loc(True):
+                self.assertEqual(Signal().src_loc[0], __file__)
+            self.assertIsNone(Signal().src_loc)
+        self.assertEqual(Signal().src_loc[0], __file__)
+
     def test_reset(self):
         s1 = Signal(4, reset=0b111, reset_less=True)
         self.assertEqual(s1.reset, 0b111)
@@ -1024,6 +1087,15 @@ class UserValueTestCase(FHDLTestCase):
         self.assertEqual(uv.shape(), unsigned(1))
         self.assertEqual(uv.lower_count, 1)
 
+    def test_attributes(self):
+        uv = MockUserValue(1)
+        uv.extra = 1
+        self.assertEqual(uv.extra, 1)
+        s = Signal()
+        self.assertFalse(hasattr(s, "__dict__"))
+        with self.assertRaises(AttributeError):
+            s.extra = 1
+
 
 class SampleTestCase(FHDLTestCase):
     def test_const(self):
@@ -1057,3 +1129,110 @@ class InitialTestCase(FHDLTestCase):
     def test_initial(self):
         i = Initial()
         self.assertEqual(i.shape(), unsigned(1))
+
+
+class SwitchTestCase(FHDLTestCase):
+    def test_signals(self):
+        t = Signal()
+        a = Signal()
+        b = Signal()
+        s = Switch(t, {1: a.eq(1)})
+        self.assertEqual(s._lhs_signals(), SignalSet((a,)))
+        self.assertEqual(s._rhs_signals(), SignalSet((t, a)))
+        s.cases = {("0",): [b.eq(1)], **s.cases}
+        self.assertEqual(s._lhs_signals(), SignalSet((b, a)))
+        self.assertEqual(s._rhs_signals(), SignalSet((t, b, a)))
+        s.test = Signal()
+        self.assertEqual(s._rhs_signals(), SignalSet((s.test, b, a)))
+
+
+class SignalCollectionTestCase(FHDLTestCase):
+    def test_set(self):
+        a = Signal()
+        b = Signal()
+        s1 = SignalSet((a, ClockSignal()))
+        s2 = SignalSet((b, ClockSignal()))
+        self.assertIn(ClockSignal(), s1)
+        self.assertEqual(repr(s1 | s2),
+                         "nmigen.hdl.ast.SignalSet((sig a), (clk sync), (sig b))")
+        self.assertEqual(repr(s1 - s2), "nmigen.hdl.ast.SignalSet((sig a))")
+        s1 |= s2
+        self.assertEqual(s1, SignalSet((a, b, ClockSignal())))
+        s1.update((a, ResetSignal()))
+        self.assertEqual(len(s1), 4)
+        s1.discard(b)
+        s1.discard(b)
+        self.assertEqual(repr(s1),
+                         "nmigen.hdl.ast.SignalSet((sig a), (clk sync), (rst sync))")
+        with self.assertRaisesRegex(TypeError,
+                r"^Object \(const 1'd1\) is not an nMigen signal$"):
+            s1.add(Const(1))
+
+    def test_dict(self):
+        a = Signal()
+        b = Signal()
+        d1 = SignalDict([(a, 1)])
+        d2 = SignalDict([(a, 2), (b, 3)])
+        d1.update(d2)
+        self.assertEqual(repr(d1), "nmigen.hdl.ast.SignalDict([((sig a), 2), ((sig b), 3)])")
+        d1.update([(ClockSignal(), 4)])
+        self.assertEqual(d1[ClockSignal()], 4)
+
+
+class ValueCollectionTestCase(FHDLTestCase):
+    def test_value_set(self):
+        a = Signal(8)
+        b = Signal(8)
+        s = ValueSet((a + b, (a + b)[0:4], Cat(a, Const(1, 2))))
+        self.assertIn(a + b, s)
+        self.assertIn((a + b)[0:4], s)
+        self.assertIn(Cat(a, Const(1, 2)), s)
+        self.assertNotIn(b + a, s)
+        self.assertNotIn((a + b)[0:5], s)
+        self.assertNotIn(Cat(a, Const(1, 3)), s)
+        self.assertNotIn(Cat(a, Const(1, 2), b), s)
+        self.assertEqual(ValueKey(Repl(a, 2)), ValueKey(Repl(a, 2)))
+        self.assertNotEqual(ValueKey(Repl(a, 2)), ValueKey(Repl(a, 3)))
+
+    def test_value_key_sort(self):
+        a = Signal(8)
+        b = Signal(8)
+        keys = [ValueKey(a[2:4]), ValueKey(a[1:5]), ValueKey(a[1:3]), ValueKey(b[0:1])]
+        self.assertEqual(sorted(keys),
+                         [ValueKey(a[1:3]), ValueKey(a[1:5]), ValueKey(a[2:4]), ValueKey(b[0:1])])
+
+
+class HashConsingTestCase(FHDLTestCase):
+    def test_hash_consing(self):
+        s = Signal(4)
+        with hash_consing():
+            self.assertIs(Const(1, 2), Const(1, 2))
+            self.assertIsNot(Const(1, 2), Const(1, 3))
+            self.assertIs(s[0], s[0])
+            self.assertIs(s[-1], s[3])
+            self.assertIs(s[0] == 1, s[0] == 1)
+            self.assertIsNot(s[0] == 1, s[0] == 0)
+            v = s + 1
+            self.assertEqual(v.src_loc[0], __file__)
+            with hash_consing(enabled=False):
+                self.assertIsNot(s + 1, v)
+                self.assertIsNot(s + 1, s + 1)
+            self.assertIs(s + 1, v)
+        self.assertIsNot(s[0], s[0])
+        self.assertEqual((s + 1).src_loc[0], __file__)
+
+    def test_transformer(self):
+        from nmigen.hdl.xfrm import ValueTransformer
+        s = Signal(4)
+        t = Signal(4)
+        class SignalReplacer(ValueTransformer):
+            def on_Signal(self, value):
+                return s if value is t else value
+
+        with hash_consing():
+            v = Slice(s, 0, 1)
+            src_loc = v.src_loc
+            e = Slice(t, 0, 1)
+            self.assertNotEqual(e.src_loc, src_loc)
+            self.assertIs(SignalReplacer()(e), v)
+            self.assertEqual(v.src_loc, src_loc)
@@ -27,6 +27,41 @@ class FragmentGetTestCase(FHDLTestCase):
                     r"^Object None cannot be elaborated$"):
                 Fragment.get(BadElaboratable(), platform=None)
 
+    def test_get_origins(self):
+        class Inner(Elaboratable):
+            def elaborate(self, platform):
+                return Fragment()
+        i = Inner()
+        f = Fragment.get(i, platform=None)
+        self.assertEqual(f.origins, (i,))
+
+        class Outer(Elaboratable):
+            def elaborate(self, platform):
+                return i
+        o = Outer()
+        f = Fragment.get(o, platform=None)
+        self.assertEqual(f.origins, (o, i))
+
+        self.assertEqual(Fragment.get(Fragment(), platform=None).origins, ())
+
+    def test_get_origins_twice(self):
+        class Cached(Elaboratable):
+            def __init__(self):
+                self.fragment = Fragment()
+
+            def elaborate(self, platform):
+                return self.fragment
+        c = Cached()
+        self.assertIs(Fragment.get(c, platform=None), c.fragment)
+        self.assertEqual(Fragment.get(c, platform=None).origins, (c,))
+
+        class Outer(Elaboratable):
+            def elaborate(self, platform):
+                return c
+        o = Outer()
+        self.assertEqual(Fragment.get(o, platform=None).origins, (o, c))
+        self.assertEqual(Fragment.get(o, platform=None).origins, (o, c))
+
 
 class FragmentGeneratedTestCase(FHDLTestCase):
     def test_find_subfragment(self):
@@ -211,6 +211,48 @@ class RecordTestCase(FHDLTestCase):
         r1 = Record([("a", UnsignedEnum)])
         self.assertEqual(r1.a.decoder(UnsignedEnum.FOO), "FOO/1")
 
+    def test_packed(self):
+        r = Record([
+            ("stb",  1),
+            ("data", 32),
+            ("info", [
+                ("a", 1),
+                ("b", 1),
+            ])
+        ], packed=True)
+
+        self.assertEqual(repr(r), "(rec r stb data (rec r__info a b))")
+        self.assertEqual(len(r),  35)
+        self.assertRepr(r.lower(), "(sig r)")
+        self.assertRepr(r.stb, "(slice (sig r) 0:1)")
+        self.assertRepr(r.data, "(slice (sig r) 1:33)")
+        self.assertRepr(r.info.lower(), "(slice (sig r) 33:35)")
+        self.assertRepr(r.info.b, "(slice (sig r) 34:35)")
+        self.assertEqual(r._lhs_signals(), SignalSet((r.lower(),)))
+        self.assertEqual(r.eq(0)._lhs_signals(), SignalSet((r.lower(),)))
+
+    def test_packed_like(self):
+        r1 = Record([("a", 1), ("b", [("s", 1)])], packed=True)
+        r2 = Record.like(r1)
+        self.assertEqual(r1.layout, r2.layout)
+        self.assertRepr(r2.lower(), "(sig r2)")
+        self.assertRepr(r2.b.s, "(slice (sig r2) 1:2)")
+
+    def test_packed_slice_tuple(self):
+        r1 = Record([("a", 1), ("b", 2), ("c", 3)], packed=True)
+        r2 = r1["a", "c"]
+        self.assertEqual(r2.layout, Layout([("a", 1), ("c", 3)]))
+        self.assertIs(r2.a, r1.a)
+        self.assertIs(r2.c, r1.c)
+
+    def test_packed_wrong(self):
+        with self.assertRaisesRegex(TypeError,
+                r"^Field 'a' of a packed record cannot be signed$"):
+            Record([("a", signed(2))], packed=True)
+        with self.assertRaisesRegex(ValueError,
+                r"^Fields of a packed record cannot be specified$"):
+            Record([("a", 1)], fields={"a": Signal()}, packed=True)
+
 
 class ConnectTestCase(FHDLTestCase):
     def setUp_flat(self):
@@ -298,6 +340,42 @@ class ConnectTestCase(FHDLTestCase):
             (eq (sig core__data__w) (| (sig periph1__data__w) (sig periph2__data__w)))
         )""")
 
+    def test_packed(self):
+        self.setUp_nested()
+
+        core    = Record(self.core_layout, packed=True)
+        periph1 = Record(self.periph_layout, packed=True)
+        periph2 = Record(self.periph_layout, packed=True)
+
+        stmts = core.connect(periph1, periph2)
+        self.assertRepr(stmts, """(
+            (eq (slice (sig periph1) 0:32) (slice (sig core) 0:32))
+            (eq (slice (sig periph2) 0:32) (slice (sig core) 0:32))
+            (eq (slice (sig core) 32:96)
+                (| (slice (sig periph1) 32:96) (slice (sig periph2) 32:96)))
+        )""")
+
+        stmts = core.connect(periph1, include={"addr": True, "data": {"w": True}})
+        self.assertRepr(stmts, """(
+            (eq (slice (sig periph1) 0:32) (slice (sig core) 0:32))
+            (eq (slice (sig core) 64:96) (slice (sig periph1) 64:96))
+        )""")
+
+    def test_packed_whole(self):
+        core   = Record([("a", 1, DIR_FANOUT), ("b", 2, DIR_FANOUT)], packed=True)
+        periph = Record.like(core)
+        self.assertRepr(core.connect(periph), """(
+            (eq (sig periph) (sig core))
+        )""")
+
+    def test_packed_unpacked(self):
+        core   = Record([("a", 1, DIR_FANOUT), ("b", 2, DIR_FANIN)], packed=True)
+        periph = Record(core.layout)
+        self.assertRepr(core.connect(periph), """(
+            (eq (sig periph__a) (slice (sig core) 0:1))
+            (eq (slice (sig core) 1:3) (sig periph__b))
+        )""")
+
     def test_wrong_include_exclude(self):
         self.setUp_flat()
 
@@ -253,6 +253,102 @@ class SampleLowererTestCase(FHDLTestCase):
         self.assertEqual(len(f.drivers["sync"]), 2)
 
 
+class SimplifierTestCase(FHDLTestCase):
+    def setUp(self):
+        self.a = Signal(4)
+        self.b = Signal(signed(4))
+        self.c = Signal()
+        self.o = Signal(8)
+
+    def assertSimplified(self, value, repr_str):
+        new_value = Simplifier().on_value(value)
+        self.assertEqual(new_value.shape(), value.shape())
+        self.assertRepr(new_value, repr_str)
+
+    def test_const(self):
+        self.assertSimplified(Const(3, 4) + Const(5, 4), "(const 5'd8)")
+        self.assertSimplified(Const(3, 4) - Const(5, 4), "(const 5'd30)")
+        self.assertSimplified(Const(1) == Const(1), "(const 1'd1)")
+        self.assertSimplified(Mux(Const(1), 3, 1), "(const 2'd3)")
+        self.assertSimplified(Cat(Const(1, 2), Const(1, 2)), "(const 4'd5)")
+        self.assertSimplified(Const(-1, signed(4))[1:3], "(const 2'd3)")
+        self.assertSimplified(Repl(Const(1, 2), 3), "(const 6'd21)")
+
+    def test_operator(self):
+        self.assertSimplified(self.a & 0, "(const 4'd0)")
+        self.assertSimplified(self.a & 0b1111, "(sig a)")
+        self.assertSimplified(self.a | 0b1111, "(const 4'd15)")
+        self.assertSimplified(self.a ^ 0, "(sig a)")
+        self.assertSimplified(self.a + 0, "(cat (sig a) (const 1'd0))")
+        self.assertSimplified(self.b * 0, "(const 5'sd0)")
+        self.assertSimplified(self.c.bool(), "(sig c)")
+        self.assertSimplified(self.a.as_unsigned(), "(sig a)")
+
+    def test_operator_keep_shape(self):
+        self.assertSimplified(self.b + 0, "(+ (sig b) (const 1'd0))")
+        self.assertSimplified(self.a.bool(), "(b (sig a))")
+        self.assertSimplified(Mux(1, self.c, self.b), "(m (const 1'd1) (sig c) (sig b))")
+
+    def test_mux(self):
+        self.assertSimplified(Mux(1, self.a, self.c), "(sig a)")
+        self.assertSimplified(Mux(0, self.a, self.c), "(cat (sig c) (const 3'd0))")
+        self.assertSimplified(Mux(self.c, self.a, self.a), "(sig a)")
+
+    def test_cat(self):
+        self.assertSimplified(Cat(self.a), "(sig a)")
+        self.assertSimplified(Cat(self.b), "(cat (sig b))")
+        self.assertSimplified(Cat(), "(const 0'd0)")
+        self.assertSimplified(Cat(self.a, Cat(self.c, Const(0, 0), 1), 1),
+                              "(cat (sig a) (sig c) (const 2'd3))")
+
+    def test_slice_part(self):
+        self.assertSimplified(self.a[0:4], "(sig a)")
+        self.assertSimplified(self.b[0:4], "(slice (sig b) 0:4)")
+        self.assertSimplified(self.a[1:4][1:3], "(slice (sig a) 2:4)")
+        self.assertSimplified(self.a.word_select(1, 2), "(slice (sig a) 2:4)")
+        self.assertSimplified(Part(self.a, Const(3, 2), 2), "(part (sig a) (const 2'd3) 2 1)")
+
+    def test_array_proxy(self):
+        self.assertSimplified(Array([self.a, self.c])[Const(1)],
+                              "(proxy (array [(sig a), (sig c)]) (const 1'd1))")
+        self.assertSimplified(Array([self.a, self.a])[Const(1)], "(sig a)")
+        self.assertSimplified(Array([self.c, self.c & self.c])[Const(3)], "(& (sig c) (sig c))")
+
+    def test_fragment(self):
+        f = Fragment()
+        f.add_statements(
+            self.o.eq(self.a & 0),
+            Switch(Const(2, 2), {
+                "1-": self.o[:4].eq(self.a),
+                "--": self.o.eq(1),
+            }),
+            Switch(Const(0, 2), {
+                1:    self.o.eq(1),
+            }),
+        )
+        f.add_driver(self.o)
+
+        f = Simplifier()(f)
+        self.assertRepr(f.statements, """
+        (
+            (eq (sig o) (const 4'd0))
+            (eq (slice (sig o) 0:4) (sig a))
+        )
+        """)
+
+    def test_prepare(self):
+        f = Fragment()
+        f.add_statements(self.o.eq(Mux(1, self.a, self.c)))
+        f.add_driver(self.o)
+
+        f = f.prepare(ports=(self.a, self.c, self.o), simplify=True)
+        self.assertRepr(f.statements, """
+        (
+            (eq (sig o) (sig a))
+        )
+        """)
+
+
 class SwitchCleanerTestCase(FHDLTestCase):
     def test_clean(self):
         a = Signal()
@@ -1,5 +1,17 @@
+import io
 import os
+import re
+import unittest
 from contextlib import contextmanager
+from unittest import mock
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from nmigen._utils import flatten, union
 from nmigen.hdl.ast import *
@@ -9,6 +21,7 @@ from nmigen.hdl.rec import *
 from nmigen.hdl.dsl import  *
 from nmigen.hdl.ir import *
 from nmigen.sim import *
+from nmigen.sim.columnar import *
 
 from .utils import *
 
@@ -250,6 +263,14 @@ class SimulatorUnitTestCase(FHDLTestCase):
         stmt = lambda y, a: [rec.eq(a), y.eq(rec)]
         self.assertStatement(stmt, [C(0b101, 3)], C(0b101, 3))
 
+    def test_record_packed(self):
+        rec = Record([
+            ("l", 1),
+            ("m", 2),
+        ], packed=True)
+        stmt = lambda y, a: [rec.m.eq(a), rec.l.eq(1), y.eq(Cat(rec.m, rec))]
+        self.assertStatement(stmt, [C(0b10, 2)], C(0b10110, 5))
+
     def test_repl(self):
         stmt = lambda y, a: y.eq(Repl(a, 3))
         self.assertStatement(stmt, [C(0b10, 2)], C(0b101010, 6))
@@ -267,6 +288,13 @@ class SimulatorUnitTestCase(FHDLTestCase):
         self.assertStatement(stmt, [C(3)], C(10))
         self.assertStatement(stmt, [C(4)], C(10))
 
+    def test_array_signed(self):
+        array = Array([-1, 2, -3])
+        stmt = lambda y, a: y.eq(array[a])
+        self.assertStatement(stmt, [C(0)], C(-1, 8))
+        self.assertStatement(stmt, [C(1)], C(2, 8))
+        self.assertStatement(stmt, [C(3)], C(-3, 8))
+
     def test_array_lhs(self):
         l = Signal(3, reset=1)
         m = Signal(3, reset=4)
@@ -779,6 +807,672 @@ class SimulatorIntegrationTestCase(FHDLTestCase):
             with sim.write_vcd(open(os.path.devnull, "wt")):
                 pass
 
+    def test_vcd_filter(self):
+        class Stage(Elaboratable):
+            def __init__(self):
+                self.i = Signal(8)
+                self.o = Signal(8)
+            def elaborate(self, platform):
+                m = Module()
+                m.submodules.inner = inner = Module()
+                inner.d.sync += self.o.eq(self.i + 1)
+                return m
+        m = Module()
+        m.submodules.s1 = s1 = Stage()
+        m.submodules.s2 = s2 = Stage()
+        x = Signal(8)
+        m.d.comb += [s1.i.eq(x), s2.i.eq(s1.o)]
+
+        def vcd_vars(**kwargs):
+            sim = Simulator(m)
+            sim.add_clock(1e-6)
+            vcd_file = io.StringIO()
+            with mock.patch.object(vcd_file, "close"):
+                with sim.write_vcd(vcd_file, **kwargs):
+                    sim.run_until(1e-5)
+            return set(re.findall(r"^\$var wire \d+ \S+ ([^\s$]+)\S* \$end$",
+                                  vcd_file.getvalue(), re.M))
+
+        self.assertEqual(vcd_vars(), {"clk", "rst", "x", "i", "o"})
+        self.assertEqual(vcd_vars(depth=0), {"x", "i", "o"})
+        self.assertEqual(vcd_vars(include="top.s1.*"), {"clk", "rst", "i", "o"})
+        self.assertEqual(vcd_vars(include=["top.x", "top.s2.*"], exclude="*.rst"),
+                         {"x", "clk", "i", "o"})
+        self.assertEqual(vcd_vars(exclude="top.s*"), {"x", "i", "o"})
+        self.assertEqual(vcd_vars(signals=[x]), {"x"})
+        self.assertEqual(vcd_vars(signals=[x], traces=[s2.o]), {"x", "o"})
+
+    def test_vcd_background(self):
+        def write_vcd(background):
+            self.setUp_capture()
+            sim = Simulator(self.m)
+            sim.add_clock(1e-6)
+            vcd_file = io.StringIO()
+            with mock.patch.object(vcd_file, "close"):
+                with sim.write_vcd(vcd_file, background=background):
+                    sim.run_until(2e-3, run_passive=True)
+            return re.sub(r"^\$date .*$", "", vcd_file.getvalue(), flags=re.M)
+        self.assertEqual(write_vcd(background=True), write_vcd(background=False))
+
+    def test_vcd_background_error(self):
+        from nmigen.sim.pysim import _VCDWriter
+        def simulator():
+            self.setUp_counter()
+            sim = Simulator(self.m)
+            sim.add_clock(1e-6)
+            return sim
+        with mock.patch.object(_VCDWriter, "update", side_effect=OSError("disk full")):
+            sim = simulator()
+            with self.assertRaisesRegex(OSError, r"^disk full$"):
+                with sim.write_vcd(io.StringIO(), background=True):
+                    sim.run_until(1e-5, run_passive=True)
+            # An exception raised by the simulation takes precedence over the one of the writer.
+            sim = simulator()
+            with self.assertRaisesRegex(ValueError, r"^simulation failed$"):
+                with sim.write_vcd(io.StringIO(), background=True):
+                    sim.run_until(1e-5, run_passive=True)
+                    raise ValueError("simulation failed")
+
+    def test_vcd_decoder(self):
+        decoded = []
+        def decoder(value):
+            decoded.append(value)
+            return "state {}".format(value)
+        s = Signal(2, decoder=decoder)
+        m = Module()
+        m.d.sync += s.eq(s + 1)
+        sim = Simulator(m)
+        sim.add_clock(1e-6)
+        vcd_file = io.StringIO()
+        with mock.patch.object(vcd_file, "close"):
+            with sim.write_vcd(vcd_file):
+                sim.run_until(1e-5, run_passive=True)
+        self.assertIn("sstate_3 ", vcd_file.getvalue())
+        self.assertEqual(sorted(decoded), [0, 1, 2, 3])
+
+    def test_vcd_compressed(self):
+        import gzip, lzma, tempfile
+        self.setUp_capture()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for filename, compression, open_fn in [
+                ("test.vcd.gz", None,   gzip.open),
+                ("test.vcd.xz", None,   lzma.open),
+                ("test.vcd",    "gzip", gzip.open),
+            ]:
+                vcd_filename = os.path.join(temp_dir, filename)
+                sim = Simulator(self.m)
+                sim.add_clock(1e-6)
+                with sim.write_vcd(vcd_filename, os.path.join(temp_dir, "test.gtkw"),
+                                   traces=[self.count], compression=compression):
+                    sim.run_until(1e-5, run_passive=True)
+                with open_fn(vcd_filename, "rt") as f:
+                    self.assertIn("$enddefinitions $end", f.read())
+
+    @unittest.skipUnless(zstandard, "requires zstandard")
+    def test_vcd_compressed_zstd(self):
+        import tempfile
+        self.setUp_capture()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vcd_filename = os.path.join(temp_dir, "test.vcd.zst")
+            sim = Simulator(self.m)
+            sim.add_clock(1e-6)
+            with sim.write_vcd(vcd_filename, traces=[self.count]):
+                sim.run_until(1e-5, run_passive=True)
+            with zstandard.open(vcd_filename, "rt") as f:
+                self.assertIn("$enddefinitions $end", f.read())
+
+    def test_vcd_compressed_zstd_missing(self):
+        import tempfile
+        sim = Simulator(Module())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with mock.patch.dict("sys.modules", {"zstandard": None}):
+                with self.assertRaisesRegex(ImportError,
+                        r"^Compressing waveforms with zstd requires the zstandard package, "
+                        r"which is installed with the 'sim-zstd' extra of nmigen$"):
+                    with sim.write_vcd(os.path.join(temp_dir, "test.vcd.zst")):
+                        pass
+
+    def test_vcd_wrong_compression(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Compression must be one of None, 'gzip', 'xz', or 'zstd', not 'bz2'$"):
+            sim.write_vcd("test.vcd.bz2", compression="bz2")
+        with self.assertRaisesRegex(ValueError,
+                r"^Compression can only be used when writing to a filename$"):
+            sim.write_vcd(io.StringIO(), compression="gzip")
+
+    def test_vcd_wrong_depth(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Depth must be a non-negative integer, not -1$"):
+            with sim.write_vcd(os.path.devnull, depth=-1):
+                pass
+
+    def test_vcd_wrong_closes_files(self):
+        sim = Simulator(Module())
+        vcd_file, gtkw_file = io.StringIO(), io.StringIO()
+        with self.assertRaisesRegex(ValueError,
+                r"^Depth must be a non-negative integer, not -1$"):
+            sim.write_vcd(vcd_file, gtkw_file, depth=-1)
+        self.assertTrue(vcd_file.closed)
+        self.assertTrue(gtkw_file.closed)
+        vcd_file, gtkw_file = io.StringIO(), io.StringIO()
+        with self.assertRaisesRegex(ValueError,
+                r"^Compression can only be used when writing to a filename$"):
+            sim.write_vcd(vcd_file, gtkw_file, compression="gzip")
+        self.assertTrue(vcd_file.closed)
+        self.assertTrue(gtkw_file.closed)
+
+    def setUp_capture(self):
+        self.count = Signal(8)
+        self.hit = Signal()
+        self.m = Module()
+        self.m.d.sync += self.count.eq(self.count + 1)
+        self.m.d.comb += self.hit.eq(self.count == 20)
+
+    def assertCapture(self, vcd_file, changes):
+        values = re.findall(r"^#(\d+)\nb(\d+) !$", vcd_file.getvalue(), re.M)
+        self.assertEqual([(round(int(timestamp), -3), int(value, 2))
+                          for timestamp, value in values], changes)
+
+    def test_capture_vcd(self):
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        vcd_file = io.StringIO()
+        with mock.patch.object(vcd_file, "close"):
+            with sim.capture_vcd(vcd_file, before=2e-6, after=1e-6, trigger=self.hit,
+                                 signals=[self.count]) as capture:
+                sim.run_until(1e-4, run_passive=True)
+        self.assertTrue(capture.triggered)
+        self.assertRegex(vcd_file.getvalue(), r"\$dumpvars\nb10001 !\n")
+        self.assertCapture(vcd_file, [(175000, 18), (185000, 19), (195000, 20), (205000, 21)])
+
+    def test_capture_vcd_exception(self):
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        def process():
+            for _ in range(10):
+                yield
+            raise AssertionError("failure")
+        sim.add_sync_process(process)
+        vcd_file = io.StringIO()
+        with mock.patch.object(vcd_file, "close"):
+            with self.assertRaisesRegex(AssertionError, r"^failure$"):
+                with sim.capture_vcd(vcd_file, before=1e-6, size=1, signals=[self.count]):
+                    sim.run()
+        self.assertRegex(vcd_file.getvalue(), r"\$dumpvars\nb1001 !\n")
+        self.assertCapture(vcd_file, [(95000, 10)])
+
+    def test_capture_vcd_exception_trigger_error(self):
+        from nmigen.sim.pysim import _VCDCapture
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        def process():
+            for _ in range(10):
+                yield
+            raise AssertionError("failure")
+        sim.add_sync_process(process)
+        with mock.patch.object(_VCDCapture, "_write", side_effect=OSError("disk full")):
+            with self.assertRaisesRegex(AssertionError, r"^failure$"):
+                with sim.capture_vcd(io.StringIO(), before=1e-5, signals=[self.count]):
+                    sim.run()
+
+    def test_capture_vcd_untriggered(self):
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        vcd_file = io.StringIO()
+        with sim.capture_vcd(vcd_file, before=1e-6) as capture:
+            sim.run_until(1e-5, run_passive=True)
+        self.assertFalse(capture.triggered)
+        self.assertTrue(vcd_file.closed)
+
+    def test_capture_vcd_wrong(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Capture time before trigger must be a non-negative number, not -1$"):
+            sim.capture_vcd(os.path.devnull, before=-1)
+        with self.assertRaisesRegex(ValueError,
+                r"^Capture buffer size must be a positive integer, not 0$"):
+            sim.capture_vcd(os.path.devnull, before=0, size=0)
+        with self.assertRaisesRegex(TypeError,
+                r"^Capture trigger must be a signal, not \(const 1'd1\)$"):
+            sim.capture_vcd(os.path.devnull, before=0, trigger=Const(1))
+        vcd_file, gtkw_file = io.StringIO(), io.StringIO()
+        with self.assertRaisesRegex(ValueError,
+                r"^Depth must be a non-negative integer, not -1$"):
+            sim.capture_vcd(vcd_file, gtkw_file, before=0, depth=-1)
+        self.assertTrue(vcd_file.closed)
+        self.assertTrue(gtkw_file.closed)
+
+    def test_write_columnar(self):
+        self.setUp_capture()
+        s = Signal(signed(4))
+        self.m.d.sync += s.eq(s - 1)
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        file = io.BytesIO()
+        with mock.patch.object(file, "close"):
+            with sim.write_columnar(file, traces=[self.count], block_size=7):
+                sim.run_until(2e-5, run_passive=True)
+        file.seek(0)
+        waveform = read_columnar(file)
+        times, values = waveform["top.count"]
+        self.assertEqual(values, list(range(21)))
+        self.assertAlmostEqual(times[1], 0.5e-6)
+        self.assertAlmostEqual(times[20], 19.5e-6)
+        times, values = waveform["top.s"]
+        self.assertEqual(values[:10], [0, -1, -2, -3, -4, -5, -6, -7, -8, 7])
+        times, values = waveform["top.hit"]
+        self.assertEqual(values, [0, 1])
+
+    def test_write_columnar_wrong(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Block size must be a positive integer, not 0$"):
+            sim.write_columnar(io.BytesIO(), block_size=0)
+        file = io.BytesIO()
+        with self.assertRaisesRegex(ValueError,
+                r"^Depth must be a non-negative integer, not -1$"):
+            sim.write_columnar(file, depth=-1)
+        self.assertTrue(file.closed)
+
+    def test_record_domain(self):
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        with sim.record([self.count, self.hit], domain="sync") as recording:
+            sim.run_until(2.2e-5, run_passive=True)
+        self.assertEqual(list(recording), [self.count, self.hit])
+        samples = recording.samples(self.count)
+        self.assertEqual([value for timestamp, value in samples], list(range(22)))
+        self.assertAlmostEqual(samples[0][0], 0.5e-6)
+        self.assertAlmostEqual(samples[21][0], 21.5e-6)
+        self.assertEqual([value for timestamp, value in recording.samples(self.hit)],
+                         [0] * 20 + [1, 0])
+
+    def test_record_changes(self):
+        self.setUp_capture()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        with sim.record([self.hit]) as recording:
+            sim.run_until(1e-4, run_passive=True)
+        samples = recording.samples(self.hit)
+        self.assertEqual([value for timestamp, value in samples], [0, 1, 0])
+        self.assertEqual(samples[0][0], 0)
+        self.assertAlmostEqual(samples[1][0], 19.5e-6)
+        self.assertAlmostEqual(samples[2][0], 20.5e-6)
+
+    @unittest.skipUnless(numpy, "requires NumPy")
+    def test_record_numpy(self):
+        self.setUp_capture()
+        wide = Signal(100, reset=1 << 99)
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        with sim.record([self.count, wide], domain="sync") as recording:
+            sim.run_until(1e-5, run_passive=True)
+        self.assertEqual(recording[self.count]["values"].tolist(), list(range(10)))
+        self.assertEqual(recording[self.count]["timestamps"].dtype, numpy.float64)
+        self.assertEqual(recording[wide]["values"].tolist(), [1 << 99] * 10)
+
+    def test_record_wrong(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(TypeError,
+                r"^Object \(const 1'd1\) is not a signal$"):
+            sim.record([Const(1)])
+        with self.assertRaisesRegex(ValueError,
+                r"^Domain 'sync' is not present in simulation$"):
+            sim.record([Signal()], domain="sync")
+
+    def test_coverage(self):
+        a = Signal()
+        b = Signal(2)
+        m = Module()
+        with m.If(a):
+            m.d.sync += b.eq(b + 1)
+        with m.Elif(b == 3):
+            m.d.sync += b.eq(0)
+        sim = Simulator(m, coverage=True)
+        sim.add_clock(1e-6)
+        def process():
+            yield a.eq(1)
+            for _ in range(3):
+                yield
+        sim.add_sync_process(process)
+        sim.run()
+        coverage = sim.coverage()
+        branches = [(patterns, case_src_loc[1] - src_loc[1], hits)
+                    for hierarchy, src_loc, patterns, case_src_loc, hits in coverage.branches
+                    if src_loc[0] == __file__]
+        self.assertEqual(branches, [(("-1",), 0, 3), (("1-",), 2, 0)])
+        toggles = {name: (rises, falls) for name, signal, rises, falls in coverage.toggles}
+        self.assertEqual(toggles[("top", "b")], (0b11, 0b01))
+        self.assertEqual(toggles[("top", "a")], (0b1, 0b0))
+        self.assertRegex(coverage.format(), r"(?m)^\d+ of 3 cases taken$")
+        self.assertRegex(coverage.format(), r"(?m)^  top\.b: 10 not toggled$")
+
+    def test_coverage_branch(self):
+        self.setUp_counter()
+        sim = Simulator(self.m, coverage={"branch"})
+        self.assertEqual(sim.coverage().toggles, [])
+
+    def test_coverage_str(self):
+        self.setUp_counter()
+        sim = Simulator(self.m, coverage="toggle")
+        sim.add_clock(1e-6)
+        sim.run_until(1e-5)
+        self.assertEqual(sim.coverage().branches, [])
+        self.assertNotEqual(sim.coverage().toggles, [])
+        with self.assertRaisesRegex(ValueError,
+                r"^Coverage kind must be one of 'branch' or 'toggle', not 'line'$"):
+            Simulator(Fragment(), coverage="line")
+
+    def test_engine_without_coverage(self):
+        from nmigen.sim.pysim import PySimEngine
+        class CustomEngine(PySimEngine):
+            def __init__(self, fragment):
+                super().__init__(fragment)
+
+        self.setUp_counter()
+        sim = Simulator(self.m, engine=CustomEngine)
+        sim.add_clock(1e-6)
+        sim.run_until(1e-5)
+
+    def test_coverage_wrong(self):
+        with self.assertRaisesRegex(ValueError,
+                r"^Coverage kind must be one of 'branch' or 'toggle', not 'line'$"):
+            Simulator(Fragment(), coverage=["line"])
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Coverage is not being collected$"):
+            sim.coverage()
+
+    def test_profile(self):
+        self.setUp_counter()
+        m = Module()
+        m.submodules.counter = self.m
+        sim = Simulator(m)
+        sim.add_clock(1e-6)
+        def process():
+            for _ in range(3):
+                yield
+        sim.add_sync_process(process)
+        with sim.profile() as profile:
+            sim.run()
+        self.assertEqual(list(profile.processes), [(("top", "counter"), "sync")])
+        counter_profile = profile.processes[("top", "counter"), "sync"]
+        self.assertEqual(counter_profile.runs, 4)
+        self.assertEqual(counter_profile.changes, 4)
+        self.assertIn(
+            "SimulatorIntegrationTestCase.test_profile.<locals>.process",
+            profile.coroutines)
+        self.assertEqual(profile.coroutines[
+            "SimulatorIntegrationTestCase.test_profile.<locals>.process"].runs, 5)
+        self.assertEqual(profile.delta_cycles[0.0], 1)
+        self.assertIn("top.counter (sync)", profile.format())
+
+    def test_counters(self):
+        self.setUp_counter()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        def process():
+            for _ in range(3):
+                yield
+        sim.add_sync_process(process)
+        sim.run()
+        counters = sim.counters
+        self.assertEqual(counters.now, 4e-6)
+        self.assertEqual(counters.cycles, {"sync": 4})
+        self.assertGreater(counters.delta_cycles, 4)
+        self.assertGreater(counters.wall_time, 0)
+        self.assertGreater(counters.cycle_rate["sync"], 0)
+        sim.reset()
+        self.assertEqual(sim.counters.cycles, {"sync": 0})
+        self.assertEqual(sim.counters.delta_cycles, 0)
+
+    def test_progress_callback_cycles(self):
+        self.setUp_counter()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        cycles = []
+        sim.add_progress_callback(lambda counters: cycles.append(counters.cycles["sync"]),
+                                  cycles=2)
+        sim.run_until(10e-6, run_passive=True)
+        self.assertEqual(cycles, [2, 4, 6, 8, 10])
+
+    def test_progress_callback_interval(self):
+        self.setUp_counter()
+        sim = Simulator(self.m)
+        sim.add_clock(1e-6)
+        calls = []
+        sim.add_progress_callback(calls.append, interval=0.0)
+        sim.run_until(1e-6, run_passive=True)
+        self.assertEqual(len(calls), 2)
+
+    def test_progress_callback_wrong(self):
+        sim = Simulator(Module())
+        with self.assertRaisesRegex(ValueError,
+                r"^Exactly one of cycles or interval must be specified$"):
+            sim.add_progress_callback(lambda counters: None)
+        with self.assertRaisesRegex(ValueError,
+                r"^Cycle count must be a positive integer, not 0$"):
+            sim.add_progress_callback(lambda counters: None, cycles=0)
+        with self.assertRaisesRegex(ValueError,
+                r"^Domain 'sync' is not present in simulation$"):
+            sim.add_progress_callback(lambda counters: None, cycles=1)
+
+    def setUp_models(self):
+        class Adder(Elaboratable):
+            def __init__(self):
+                self.a = Signal(8)
+                self.b = Signal(8)
+                self.o = Signal(8)
+
+            def elaborate(self, platform):
+                m = Module()
+                m.d.comb += self.o.eq(self.a - self.b) # deliberately wrong
+                return m
+
+        self.Adder = Adder
+        self.adder = Adder()
+        self.i = Signal(8)
+        self.o = Signal(8)
+        self.m = Module()
+        self.m.submodules.adder = self.adder
+        self.m.submodules.black_box = self.black_box = \
+            Instance("black_box", i_a=self.adder.o, o_y=self.o)
+        self.m.d.comb += [
+            self.adder.a.eq(self.i),
+            self.adder.b.eq(1),
+        ]
+
+    def test_models(self):
+        self.setUp_models()
+        def adder_model(adder):
+            while True:
+                yield adder.o.eq((yield adder.a) + (yield adder.b))
+                yield Delay(1e-6)
+        def black_box_model(black_box):
+            a, _ = black_box.named_ports["a"]
+            y, _ = black_box.named_ports["y"]
+            while True:
+                yield y.eq((yield a) * 2)
+                yield Delay(1e-6)
+        sim = Simulator(self.m, models={
+            self.Adder: adder_model,
+            self.black_box: black_box_model,
+        })
+        def process():
+            yield self.i.eq(5)
+            yield Delay(3e-6)
+            self.assertEqual((yield self.adder.o), 6)
+            self.assertEqual((yield self.o), 12)
+        sim.add_process(process)
+        sim.run()
+
+    def test_models_precedence(self):
+        self.setUp_models()
+        models_called = []
+        def instance_model(adder):
+            models_called.append("instance")
+            yield Delay(0)
+        def class_model(adder):
+            models_called.append("class")
+            yield Delay(0)
+        sim = Simulator(self.m, models={
+            self.Adder: class_model,
+            self.adder: instance_model,
+        })
+        sim.run()
+        self.assertEqual(models_called, ["instance"])
+
+    def test_models_fragment_unchanged(self):
+        self.setUp_models()
+        fragment = Fragment.get(self.m, platform=None)
+        subfragments = list(fragment.subfragments)
+        adder_fragment, _ = fragment.subfragments[0]
+        adder_statements = list(adder_fragment.statements)
+        def adder_model(adder):
+            yield Delay(0)
+        Simulator(fragment, models={self.adder: adder_model})
+        self.assertEqual(fragment.subfragments, subfragments)
+        self.assertEqual(len(adder_fragment.statements), len(adder_statements))
+        self.assertEqual(len(adder_statements), 1)
+
+    def test_models_wrong(self):
+        self.setUp_models()
+        with self.assertRaisesRegex(TypeError,
+                r"^Cannot use 1 as a model because it is not a generator function$"):
+            Simulator(self.m, models={self.adder: 1})
+
+    def test_cxxrtl(self):
+        class Accumulator(Elaboratable):
+            def __init__(self):
+                self.i = Signal(signed(8))
+                self.o = Signal(signed(8))
+                self.n = Signal(signed(8))
+            def elaborate(self, platform):
+                m = Module()
+                m.d.sync += self.o.eq(self.o + self.i)
+                m.d.comb += self.n.eq(-self.o)
+                return m
+        acc = Accumulator()
+        o = Signal(signed(8))
+        m = Module()
+        m.submodules.acc = acc
+        m.d.comb += o.eq(acc.n + 1)
+        sim = Simulator(m, cxxrtl={Accumulator})
+        sim.add_clock(1e-6)
+        def process():
+            yield acc.i.eq(-3)
+            for cycle in range(1, 4):
+                yield
+                yield Settle()
+                self.assertEqual((yield acc.o), -3 * cycle)
+                self.assertEqual((yield acc.n), 3 * cycle)
+                self.assertEqual((yield o), 3 * cycle + 1)
+        sim.add_sync_process(process)
+        with sim.profile() as profile:
+            sim.run()
+        self.assertIn((("top", "acc"), "cxxrtl"), profile.processes)
+
+    def test_cxxrtl_wrong_port(self):
+        from nmigen.sim._cxxrtl import CxxrtlLibrary
+        class Inverter(Elaboratable):
+            def __init__(self):
+                self.i = Signal(8)
+                self.o = Signal(8)
+            def elaborate(self, platform):
+                m = Module()
+                m.d.comb += self.o.eq(~self.i)
+                return m
+        inv = Inverter()
+        m = Module()
+        m.submodules.inv = inv
+        get = CxxrtlLibrary.get
+        def get_without_output(library, signal):
+            if signal is inv.o:
+                return None
+            return get(library, signal)
+        with mock.patch.object(CxxrtlLibrary, "get", get_without_output):
+            with self.assertRaisesRegex(NotImplementedError,
+                    r"^Cannot simulate port \(sig o\) with CXXRTL because it is not a single "
+                    r"object in the compiled design$"):
+                Simulator(m, cxxrtl={Inverter})
+        def get_read_only_input(library, signal):
+            value = get(library, signal)
+            if signal is inv.i:
+                value.next = None
+            return value
+        with mock.patch.object(CxxrtlLibrary, "get", get_read_only_input):
+            with self.assertRaisesRegex(NotImplementedError,
+                    r"^Cannot simulate input port \(sig i\) with CXXRTL because it cannot be "
+                    r"written in the compiled design$"):
+                Simulator(m, cxxrtl={Inverter})
+
+    def test_cxxsim(self):
+        self.setUp_counter()
+        x = Signal(3)
+        self.m.d.comb += x.eq(~self.count)
+        sim = Simulator(self.m, engine="cxxsim")
+        sim.add_clock(1e-6)
+        times = 0
+        def process():
+            nonlocal times
+            self.assertEqual((yield self.count), 4)
+            self.assertEqual((yield x), 3)
+            yield
+            self.assertEqual((yield self.count), 5)
+            self.assertEqual((yield x), 2)
+            yield Settle()
+            self.assertEqual((yield self.count), 6)
+            self.assertEqual((yield x), 1)
+            times += 1
+        sim.add_sync_process(process)
+        with sim.write_vcd("test.vcd"):
+            sim.run()
+        sim.reset()
+        sim.run()
+        self.assertEqual(times, 2)
+
+    def test_cxxsim_units(self):
+        class Stage(Elaboratable):
+            def __init__(self):
+                self.i = Signal(8)
+                self.o = Signal(8)
+            def elaborate(self, platform):
+                m = Module()
+                m.d.sync += self.o.eq(self.i + 1)
+                return m
+        m = Module()
+        m.submodules.s1 = s1 = Stage()
+        m.submodules.s2 = s2 = Stage()
+        m.submodules.s3 = s3 = Stage()
+        m.d.comb += [s2.i.eq(s1.o), s3.i.eq(s2.o)]
+        with mock.patch.dict(os.environ, {"NMIGEN_cxxrtl_units": "3"}):
+            sim = Simulator(m, engine="cxxsim")
+        sim.add_clock(1e-6)
+        def process():
+            yield s1.i.eq(10)
+            for _ in range(4):
+                yield
+            self.assertEqual((yield s1.o), 11)
+            self.assertEqual((yield s2.o), 12)
+            self.assertEqual((yield s3.o), 13)
+        sim.add_sync_process(process)
+        sim.run()
+
+    def test_profile_wrong_nested(self):
+        sim = Simulator(Module())
+        with sim.profile():
+            with self.assertRaisesRegex(ValueError,
+                    r"^Simulation is already being profiled$"):
+                with sim.profile():
+                    pass
+
 
 class SimulatorRegressionTestCase(FHDLTestCase):
     def test_bug_325(self):
@@ -797,3 +1491,26 @@ class SimulatorRegressionTestCase(FHDLTestCase):
             self.assertEqual((yield -(Const(0b11, 2).as_signed())), 1)
         sim.add_process(process)
         sim.run()
+
+
+class ColumnarTestCase(FHDLTestCase):
+    def test_roundtrip(self):
+        file = io.BytesIO()
+        writer = ColumnarWriter(file, timescale=1, block_size=2)
+        a = writer.add_signal([("top", "a"), ("top", "sub", "a")], width=100, reset=1)
+        b = writer.add_signal([("top", "b")], width=8, signed=True)
+        writer.change(1, a, 1 << 99)
+        writer.change(2, b, -1)
+        writer.change(3, a, 5)
+        with mock.patch.object(file, "close"):
+            writer.close(4)
+        file.seek(0)
+        waveform = read_columnar(file)
+        self.assertEqual(waveform["top.a"], ([0, 1, 3], [1, 1 << 99, 5]))
+        self.assertEqual(waveform["top.sub.a"], waveform["top.a"])
+        self.assertEqual(waveform["top.b"], ([0, 2], [0, -1]))
+
+    def test_wrong_magic(self):
+        with self.assertRaisesRegex(ValueError,
+                r"^Not a columnar waveform file$"):
+            read_columnar(io.BytesIO(b"$date"))
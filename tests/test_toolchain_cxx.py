@@ -2,7 +2,10 @@ import os
 import ctypes
 import tempfile
 import unittest
+from unittest import mock
+from distutils import ccompiler
 
+from nmigen._toolchain import cxx
 from nmigen._toolchain.cxx import *
 
 
@@ -10,12 +13,17 @@ class ToolchainCxxTestCase(unittest.TestCase):
     def setUp(self):
         self.include_dir = None
         self.build_dir = None
+        self.cache_dir = tempfile.TemporaryDirectory(prefix="nmigen_cache_")
+        self.environ = mock.patch.dict(os.environ, {"NMIGEN_CXX_CACHE_DIR": self.cache_dir.name})
+        self.environ.start()
 
     def tearDown(self):
         if self.include_dir:
             self.include_dir.cleanup()
         if self.build_dir:
             self.build_dir.cleanup()
+        self.environ.stop()
+        self.cache_dir.cleanup()
 
     def test_filename(self):
         self.build_dir, filename = build_cxx(
@@ -66,3 +74,106 @@ class ToolchainCxxTestCase(unittest.TestCase):
         )
         library = ctypes.cdll.LoadLibrary(os.path.join(self.build_dir.name, filename))
         self.assertEqual(library.answer(), 42)
+
+    def test_cache_hit(self):
+        build_args = dict(
+            cxx_sources={"test.cc": """
+                extern "C" int answer() { return 42; }
+            """},
+            output_name="answer",
+            include_dirs=[],
+            macros=[],
+        )
+        self.build_dir, filename = build_cxx(**build_args)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 2) # object and library
+        self.build_dir.cleanup()
+
+        with mock.patch.object(ccompiler.CCompiler, "compile", side_effect=AssertionError):
+            self.build_dir, filename = build_cxx(**build_args)
+        library = ctypes.cdll.LoadLibrary(os.path.join(self.build_dir.name, filename))
+        self.assertEqual(library.answer(), 42)
+
+    def test_cache_miss(self):
+        self.build_dir, filename = build_cxx(
+            cxx_sources={"test.cc": """
+                extern "C" int answer() { return ANSWER; }
+            """},
+            output_name="answer",
+            include_dirs=[],
+            macros=["ANSWER=42"],
+        )
+        self.build_dir.cleanup()
+        self.build_dir, filename = build_cxx(
+            cxx_sources={"test.cc": """
+                extern "C" int answer() { return ANSWER; }
+            """},
+            output_name="answer",
+            include_dirs=[],
+            macros=["ANSWER=43"],
+        )
+        library = ctypes.cdll.LoadLibrary(os.path.join(self.build_dir.name, filename))
+        self.assertEqual(library.answer(), 43)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 4)
+
+    def test_cache_objects(self):
+        def build(question):
+            compiled = []
+            def compile(self, sources, *args, **kwargs):
+                compiled.extend(sources)
+                return original_compile(self, sources, *args, **kwargs)
+            original_compile = ccompiler.CCompiler.compile
+            with mock.patch.object(ccompiler.CCompiler, "compile", compile):
+                self.build_dir, filename = build_cxx(
+                    cxx_sources={
+                        "answer.cc": """
+                            extern "C" int answer() { return 42; }
+                        """,
+                        "question.cc": """
+                            extern "C" int question() { return %d; }
+                        """ % question,
+                    },
+                    output_name="answer",
+                    include_dirs=[],
+                    macros=[],
+                )
+            library = ctypes.cdll.LoadLibrary(os.path.join(self.build_dir.name, filename))
+            self.assertEqual(library.answer(), 42)
+            self.assertEqual(library.question(), question)
+            self.build_dir.cleanup()
+            return sorted(compiled)
+
+        self.assertEqual(build(6), ["answer.cc", "question.cc"])
+        self.assertEqual(build(7), ["question.cc"])
+        self.assertEqual(build(6), [])
+
+    def test_cache_disabled(self):
+        with mock.patch.dict(os.environ, {"NMIGEN_CXX_CACHE_DIR": ""}):
+            self.build_dir, filename = build_cxx(
+                cxx_sources={"test.cc": ""},
+                output_name="answer",
+                include_dirs=[],
+                macros=[],
+            )
+        self.assertEqual(os.listdir(self.cache_dir.name), [])
+
+    def test_cache_size_wrong(self):
+        with mock.patch.dict(os.environ, {"NMIGEN_CXX_CACHE_SIZE": "1G"}):
+            with self.assertRaisesRegex(ValueError,
+                    r"^Environment variable NMIGEN_CXX_CACHE_SIZE must be a non-negative "
+                    r"integer, not '1G'$"):
+                build_cxx(
+                    cxx_sources={"test.cc": ""},
+                    output_name="answer",
+                    include_dirs=[],
+                    macros=[],
+                )
+        self.assertEqual(os.listdir(self.cache_dir.name), [])
+
+    def test_cache_evict(self):
+        for index, name in enumerate(["a", "b", "c"]):
+            path = os.path.join(self.cache_dir.name, name)
+            with open(path, "wb") as f:
+                f.write(b"\0" * 100)
+            os.utime(path, (index, index))
+        cxx._cache_evict(self.cache_dir.name, size_limit=250)
+        self.assertEqual(sorted(os.listdir(self.cache_dir.name)), ["b", "c"])